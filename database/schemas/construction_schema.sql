@@ -16,9 +16,20 @@ CREATE TABLE IF NOT EXISTS construction_documents (
     uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     uploaded_by UUID REFERENCES auth.users(id),
     project_id UUID, -- For future project association
+    file_fingerprint TEXT, -- SHA-256 of the PDF, set once ingest completes
     metadata JSONB DEFAULT '{}'::jsonb
 );
 
+-- array_to_string is only STABLE; generated columns need an IMMUTABLE expression
+CREATE OR REPLACE FUNCTION construction_tags_text(tags TEXT[])
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT array_to_string(tags, ' ');
+$$;
+
 -- Construction pages table (main storage)
 CREATE TABLE IF NOT EXISTS construction_pages (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -29,26 +40,59 @@ CREATE TABLE IF NOT EXISTS construction_pages (
     tags TEXT[] NOT NULL, -- Array of single-word tags
     summary TEXT NOT NULL,
     content TEXT NOT NULL, -- Full page text
+    content_hash TEXT, -- SHA-256 of whitespace-normalized content, for incremental re-ingest
     embedding vector(384), -- Embeddings for semantic search
+    -- Full-text document: tags and summary rank above body text
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(construction_tags_text(tags), '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+        setweight(to_tsvector('english', content), 'D')
+    ) STORED,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     
     -- Constraints
     CONSTRAINT unique_page_per_doc UNIQUE (document_id, page_number)
 );
 
+-- The whole script is idempotent, so re-running it upgrades an existing
+-- install: these add columns created after the first release, and every
+-- index, function and policy below is created only if missing or replaced
+-- in place
+ALTER TABLE construction_documents ADD COLUMN IF NOT EXISTS file_fingerprint TEXT;
+ALTER TABLE construction_pages ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE construction_pages ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(construction_tags_text(tags), '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+    setweight(to_tsvector('english', content), 'D')
+) STORED;
+
+-- Replaced by idx_construction_pages_search_vector
+DROP INDEX IF EXISTS idx_construction_pages_fulltext;
+
 -- Indexes for fast searching
-CREATE INDEX idx_construction_pages_system ON construction_pages(system);
-CREATE INDEX idx_construction_pages_tags ON construction_pages USING GIN(tags);
-CREATE INDEX idx_construction_pages_embedding ON construction_pages USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
-CREATE INDEX idx_construction_pages_document ON construction_pages(document_id);
-CREATE INDEX idx_construction_pages_fulltext ON construction_pages USING GIN(to_tsvector('english', content));
+CREATE INDEX IF NOT EXISTS idx_construction_pages_system ON construction_pages(system);
+CREATE INDEX IF NOT EXISTS idx_construction_pages_tags ON construction_pages USING GIN(tags);
+-- Embedding indexes (global plus one partial index per system) are created by
+-- rebuild_construction_vector_index() below
+CREATE INDEX IF NOT EXISTS idx_construction_pages_document ON construction_pages(document_id);
+-- Keyset pagination for GET /browse/{system}
+CREATE INDEX IF NOT EXISTS idx_construction_pages_browse ON construction_pages(system, document_name, page_number, id);
+CREATE INDEX IF NOT EXISTS idx_construction_documents_fingerprint ON construction_documents(file_fingerprint);
+CREATE INDEX IF NOT EXISTS idx_construction_documents_name ON construction_documents(document_name);
+CREATE INDEX IF NOT EXISTS idx_construction_pages_search_vector ON construction_pages USING GIN(search_vector);
 
 -- Function for semantic search
+-- ef_search (HNSW) and probes (IVFFlat) trade latency for recall per query
+DROP FUNCTION IF EXISTS search_construction_pages(vector, float, int, text);
+DROP FUNCTION IF EXISTS search_construction_pages(vector, float, int, text, int, int);
 CREATE OR REPLACE FUNCTION search_construction_pages(
     query_embedding vector(384),
     match_threshold float DEFAULT 0.5,
     match_count int DEFAULT 10,
-    system_filter text DEFAULT NULL
+    system_filter text DEFAULT NULL,
+    ef_search int DEFAULT NULL,
+    probes int DEFAULT NULL,
+    tag_filter text[] DEFAULT NULL
 )
 RETURNS TABLE (
     id UUID,
@@ -61,29 +105,180 @@ RETURNS TABLE (
 )
 LANGUAGE plpgsql
 AS $$
+DECLARE
+    vector_version INT[];
 BEGIN
-    RETURN QUERY
-    SELECT 
-        cp.id,
-        cp.document_name,
-        cp.page_number,
-        cp.system,
-        cp.tags,
-        cp.summary,
-        1 - (cp.embedding <=> query_embedding) as similarity
-    FROM construction_pages cp
-    WHERE 
-        (system_filter IS NULL OR cp.system = system_filter)
-        AND 1 - (cp.embedding <=> query_embedding) > match_threshold
-    ORDER BY cp.embedding <=> query_embedding
-    LIMIT match_count;
+    -- An HNSW scan returns at most ef_search rows, so the default (40) would
+    -- cap match_count and starve the tag post-filter. Transaction-local, so
+    -- settings never leak to other requests
+    PERFORM set_config('hnsw.ef_search',
+                       LEAST(1000, COALESCE(ef_search, GREATEST(40,
+                           CASE WHEN tag_filter IS NULL THEN match_count ELSE match_count * 10 END)))::text,
+                       true);
+    IF probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', probes::text, true);
+    END IF;
+    
+    -- pgvector 0.8+ keeps scanning until enough rows pass the tag filter
+    IF tag_filter IS NOT NULL THEN
+        SELECT string_to_array(split_part(extversion, '-', 1), '.')::int[] INTO vector_version
+        FROM pg_extension WHERE extname = 'vector';
+        IF vector_version >= ARRAY[0, 8] THEN
+            PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+            PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+        END IF;
+    END IF;
+    
+    -- Top-k comes straight off the ANN index; the threshold only trims that
+    -- set afterwards. The system literal is inlined so the planner can match
+    -- it against the per-system partial index predicates
+    RETURN QUERY EXECUTE format($query$
+        SELECT
+            nearest.id,
+            nearest.document_name,
+            nearest.page_number,
+            nearest.system,
+            nearest.tags,
+            nearest.summary,
+            1 - nearest.distance AS similarity
+        FROM (
+            SELECT cp.id, cp.document_name, cp.page_number, cp.system, cp.tags, cp.summary,
+                   cp.embedding <=> $1 AS distance
+            FROM construction_pages cp
+            WHERE cp.embedding IS NOT NULL %s
+                AND ($4::text[] IS NULL OR cp.tags && $4)
+            ORDER BY cp.embedding <=> $1
+            LIMIT $2
+        ) nearest
+        WHERE 1 - nearest.distance > $3
+        ORDER BY nearest.distance
+    $query$, CASE WHEN system_filter IS NULL THEN ''
+                  ELSE format('AND cp.system = %L', system_filter) END)
+    USING query_embedding, match_count, match_threshold, tag_filter;
+END;
+$$;
+
+-- Name of the partial embedding index for one system, e.g. Fire-Safety -> ..._fire_safety
+CREATE OR REPLACE FUNCTION construction_vector_index_name(system_name TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT 'idx_construction_pages_embedding_' || lower(regexp_replace(system_name, '[^A-Za-z0-9]+', '_', 'g'));
+$$;
+
+-- USING/WITH clause for an embedding index over row_count rows
+CREATE OR REPLACE FUNCTION construction_vector_index_options(
+    index_type TEXT,
+    row_count BIGINT,
+    lists INT DEFAULT NULL,
+    m INT DEFAULT 16,
+    ef_construction INT DEFAULT 64
+)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT CASE index_type
+        WHEN 'ivfflat' THEN format('USING ivfflat (embedding vector_cosine_ops) WITH (lists = %s)',
+            COALESCE(lists, GREATEST(10, CASE
+                WHEN row_count <= 1000000 THEN row_count / 1000
+                ELSE floor(sqrt(row_count))::bigint
+            END)))
+        ELSE format('USING hnsw (embedding vector_cosine_ops) WITH (m = %s, ef_construction = %s)', m, ef_construction)
+    END;
+$$;
+
+-- Rebuild the embedding indexes as HNSW or IVFFlat: one global index plus a
+-- partial index per system, so filtered semantic searches stay index-driven.
+-- IVFFlat lists default to rows / 1000 (sqrt(rows) above 1M rows), per pgvector guidance
+CREATE OR REPLACE FUNCTION rebuild_construction_vector_index(
+    index_type TEXT DEFAULT 'hnsw',
+    lists INT DEFAULT NULL,
+    m INT DEFAULT 16,
+    ef_construction INT DEFAULT 64
+)
+RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+-- extensions: where Supabase installs pgvector (vector_cosine_ops, hnsw, ivfflat)
+SET search_path = public, extensions, pg_temp
+AS $$
+DECLARE
+    total_rows BIGINT;
+    system_rows BIGINT;
+    system_name TEXT;
+    old_index TEXT;
+BEGIN
+    IF index_type NOT IN ('hnsw', 'ivfflat') THEN
+        RAISE EXCEPTION 'Unknown vector index type: %', index_type;
+    END IF;
+    
+    -- Index builds outlast the API's default statement timeout
+    PERFORM set_config('statement_timeout', '0', true);
+    PERFORM set_config('maintenance_work_mem', '512MB', true);
+    
+    FOR old_index IN
+        SELECT indexname FROM pg_indexes
+        WHERE tablename = 'construction_pages' AND indexname LIKE 'idx_construction_pages_embedding%'
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS %I', old_index);
+    END LOOP;
+    
+    SELECT COUNT(*) INTO total_rows FROM construction_pages WHERE embedding IS NOT NULL;
+    EXECUTE format('CREATE INDEX idx_construction_pages_embedding ON construction_pages %s',
+                   construction_vector_index_options(index_type, total_rows, lists, m, ef_construction));
+    
+    -- Known systems always get an index, so the first pages of a system are covered too
+    FOR system_name IN
+        SELECT unnest(ARRAY['HVAC', 'Electrical', 'Plumbing', 'Fire-Safety', 'Structural', 'General'])
+        UNION
+        SELECT DISTINCT cp.system FROM construction_pages cp
+    LOOP
+        SELECT COUNT(*) INTO system_rows FROM construction_pages cp
+        WHERE cp.system = system_name AND cp.embedding IS NOT NULL;
+        EXECUTE format('CREATE INDEX %I ON construction_pages %s WHERE system = %L',
+                       construction_vector_index_name(system_name),
+                       construction_vector_index_options(index_type, system_rows, NULL, m, ef_construction),
+                       system_name);
+    END LOOP;
+    
+    ANALYZE construction_pages;
+    
+    RETURN format('%s indexes on %s rows', index_type, total_rows);
+END;
+$$;
+
+-- Drops and rebuilds indexes with no statement timeout: maintenance callers only
+REVOKE EXECUTE ON FUNCTION rebuild_construction_vector_index(TEXT, INT, INT, INT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION rebuild_construction_vector_index(TEXT, INT, INT, INT) TO service_role;
+
+-- HNSW needs no training data, so the initial indexes work on an empty table;
+-- re-run after bulk ingest to switch to or resize IVFFlat. Only built when the
+-- per-system indexes are missing (fresh installs and the single IVFFlat index
+-- of the first release), so re-running the script keeps tuned indexes
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_indexes
+        WHERE tablename = 'construction_pages'
+            AND indexname = construction_vector_index_name('HVAC')
+    ) THEN
+        PERFORM rebuild_construction_vector_index('hnsw');
+    END IF;
 END;
 $$;
 
 -- Function for tag-based search
+-- Keyset pagination: pass the last row's (tag_matches, document_name,
+-- page_number, id) as after_* to get the rows that follow it
+DROP FUNCTION IF EXISTS search_by_tags(TEXT[], TEXT);
 CREATE OR REPLACE FUNCTION search_by_tags(
     search_tags TEXT[],
-    system_filter TEXT DEFAULT NULL
+    system_filter TEXT DEFAULT NULL,
+    limit_results INTEGER DEFAULT 50,
+    after_matches INTEGER DEFAULT NULL,
+    after_document_name TEXT DEFAULT NULL,
+    after_page_number INTEGER DEFAULT NULL,
+    after_id UUID DEFAULT NULL
 )
 RETURNS TABLE (
     id UUID,
@@ -94,80 +289,336 @@ RETURNS TABLE (
     summary TEXT,
     tag_matches INTEGER
 )
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
 AS $$
-BEGIN
-    RETURN QUERY
-    SELECT 
-        cp.id,
-        cp.document_name,
-        cp.page_number,
-        cp.system,
-        cp.tags,
-        cp.summary,
-        cardinality(cp.tags && search_tags) as tag_matches
-    FROM construction_pages cp
-    WHERE 
-        cp.tags && search_tags
-        AND (system_filter IS NULL OR cp.system = system_filter)
-    ORDER BY cardinality(cp.tags && search_tags) DESC, cp.page_number;
-END;
+    SELECT matches.*
+    FROM (
+        SELECT 
+            cp.id,
+            cp.document_name,
+            cp.page_number,
+            cp.system,
+            cp.tags,
+            cp.summary,
+            (SELECT COUNT(*)::int FROM unnest(cp.tags) AS tag WHERE tag = ANY(search_tags)) AS tag_matches
+        FROM construction_pages cp
+        WHERE 
+            cp.tags && search_tags
+            AND (system_filter IS NULL OR cp.system = system_filter)
+    ) matches
+    WHERE after_matches IS NULL
+        OR (-matches.tag_matches, matches.document_name, matches.page_number, matches.id)
+           > (-after_matches, after_document_name, after_page_number, after_id)
+    ORDER BY matches.tag_matches DESC, matches.document_name, matches.page_number, matches.id
+    LIMIT limit_results;
 $$;
 
 -- Function for full-text search
+-- Snippets are ts_headline fragments with matches wrapped in <mark>. They
+-- are computed only for the rows returned, since ts_headline re-parses the
+-- page text. With collapse_documents only the best page of each document
+-- is returned, with its number of matching pages in document_hits
+DROP FUNCTION IF EXISTS search_construction_text(TEXT, TEXT, INTEGER);
 CREATE OR REPLACE FUNCTION search_construction_text(
     search_query TEXT,
     system_filter TEXT DEFAULT NULL,
-    limit_results INTEGER DEFAULT 20
+    limit_results INTEGER DEFAULT 20,
+    collapse_documents BOOLEAN DEFAULT FALSE,
+    with_snippets BOOLEAN DEFAULT TRUE
 )
 RETURNS TABLE (
     id UUID,
+    document_id UUID,
     document_name TEXT,
     page_number INTEGER,
     system VARCHAR(50),
     tags TEXT[],
     summary TEXT,
-    rank REAL
+    rank REAL,
+    snippet TEXT,
+    document_hits INTEGER
 )
-LANGUAGE plpgsql
+LANGUAGE sql
+STABLE
 AS $$
-BEGIN
-    RETURN QUERY
-    SELECT 
+    WITH query AS (
+        SELECT plainto_tsquery('english', search_query) AS q
+    ),
+    matches AS (
+        SELECT cp.id, cp.document_id, ts_rank(cp.search_vector, query.q) AS rank
+        FROM construction_pages cp, query
+        WHERE
+            cp.search_vector @@ query.q
+            AND (system_filter IS NULL OR cp.system = system_filter)
+    ),
+    -- Only one branch runs; the other is cut off by its constant filter
+    top_pages AS (
+        (SELECT m.id, m.rank, 1 AS document_hits
+         FROM matches m
+         WHERE NOT collapse_documents
+         ORDER BY m.rank DESC
+         LIMIT limit_results)
+        UNION ALL
+        (SELECT best.id, best.rank, best.document_hits
+         FROM (
+             SELECT
+                 m.id,
+                 m.rank,
+                 ROW_NUMBER() OVER (PARTITION BY COALESCE(m.document_id, m.id) ORDER BY m.rank DESC, m.id) AS document_rank,
+                 COUNT(*) OVER (PARTITION BY COALESCE(m.document_id, m.id))::int AS document_hits
+             FROM matches m
+             WHERE collapse_documents
+         ) best
+         WHERE best.document_rank = 1
+         ORDER BY best.rank DESC
+         LIMIT limit_results)
+    )
+    SELECT
         cp.id,
+        cp.document_id,
         cp.document_name,
         cp.page_number,
         cp.system,
         cp.tags,
         cp.summary,
-        ts_rank(to_tsvector('english', cp.content), plainto_tsquery('english', search_query)) as rank
+        top_pages.rank,
+        CASE WHEN with_snippets THEN
+            ts_headline('english', cp.content, query.q,
+                        'StartSel=<mark>, StopSel=</mark>, MinWords=15, MaxWords=35, MaxFragments=2, FragmentDelimiter=" … "')
+        END AS snippet,
+        top_pages.document_hits
+    FROM top_pages
+    JOIN construction_pages cp ON cp.id = top_pages.id
+    CROSS JOIN query
+    ORDER BY top_pages.rank DESC;
+$$;
+
+-- Function for hybrid search: full-text and vector candidates fused with
+-- reciprocal rank fusion, score = sum(weight / (rrf_k + rank)) per list
+DROP FUNCTION IF EXISTS search_construction_hybrid(TEXT, vector, INT, TEXT, FLOAT, FLOAT, INT);
+CREATE OR REPLACE FUNCTION search_construction_hybrid(
+    query_text TEXT,
+    query_embedding vector(384),
+    match_count INT DEFAULT 10,
+    system_filter TEXT DEFAULT NULL,
+    full_text_weight FLOAT DEFAULT 1.0,
+    semantic_weight FLOAT DEFAULT 1.0,
+    rrf_k INT DEFAULT 50,
+    with_snippets BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE (
+    id UUID,
+    document_name TEXT,
+    page_number INTEGER,
+    system VARCHAR(50),
+    tags TEXT[],
+    summary TEXT,
+    rank REAL,
+    similarity FLOAT,
+    score FLOAT,
+    snippet TEXT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- The semantic list takes match_count * 4 candidates, more than the
+    -- default hnsw.ef_search (40) would let an HNSW scan return
+    PERFORM set_config('hnsw.ef_search', LEAST(1000, GREATEST(40, match_count * 4))::text, true);
+    
+    -- The system literal is inlined so the semantic branch can use the
+    -- per-system partial index, as in search_construction_pages
+    RETURN QUERY EXECUTE format($query$
+        WITH full_text AS (
+            SELECT
+                ft.id,
+                ft.rank,
+                ROW_NUMBER() OVER (ORDER BY ft.rank DESC) AS rank_ix
+            FROM (
+                SELECT
+                    cp.id,
+                    ts_rank(cp.search_vector, query) AS rank
+                FROM construction_pages cp, plainto_tsquery('english', $1) query
+                WHERE cp.search_vector @@ query %1$s
+                ORDER BY rank DESC
+                LIMIT $3 * 4
+            ) ft
+        ),
+        semantic AS (
+            SELECT
+                sem.id,
+                1 - sem.distance AS similarity,
+                ROW_NUMBER() OVER (ORDER BY sem.distance) AS rank_ix
+            FROM (
+                SELECT
+                    cp.id,
+                    cp.embedding <=> $2 AS distance
+                FROM construction_pages cp
+                WHERE cp.embedding IS NOT NULL %1$s
+                ORDER BY cp.embedding <=> $2
+                LIMIT $3 * 4
+            ) sem
+        ),
+        fused AS (
+            SELECT
+                COALESCE(full_text.id, semantic.id) AS id,
+                full_text.rank,
+                semantic.similarity,
+                COALESCE($4 / ($6 + full_text.rank_ix), 0.0)
+                    + COALESCE($5 / ($6 + semantic.rank_ix), 0.0) AS score
+            FROM full_text
+            FULL OUTER JOIN semantic ON full_text.id = semantic.id
+            ORDER BY score DESC
+            LIMIT $3
+        )
+        -- Snippets only for the fused top rows
+        SELECT
+            cp.id,
+            cp.document_name,
+            cp.page_number,
+            cp.system,
+            cp.tags,
+            cp.summary,
+            fused.rank,
+            fused.similarity,
+            fused.score,
+            CASE WHEN $7 THEN
+                ts_headline('english', cp.content, plainto_tsquery('english', $1),
+                            'StartSel=<mark>, StopSel=</mark>, MinWords=15, MaxWords=35, MaxFragments=2, FragmentDelimiter=" … "')
+            END AS snippet
+        FROM fused
+        JOIN construction_pages cp ON cp.id = fused.id
+        ORDER BY fused.score DESC
+    $query$, CASE WHEN system_filter IS NULL THEN ''
+                  ELSE format('AND cp.system = %L', system_filter) END)
+    USING query_text, query_embedding, match_count, full_text_weight, semantic_weight,
+          rrf_k, with_snippets;
+END;
+$$;
+
+-- Per-system page counts and most common tags for GET /systems
+-- Refreshed by the document processor after each ingest
+CREATE MATERIALIZED VIEW IF NOT EXISTS construction_system_stats AS
+WITH tag_counts AS (
+    SELECT cp.system, tag, COUNT(*) AS tag_count
+    FROM construction_pages cp, unnest(cp.tags) AS tag
+    GROUP BY cp.system, tag
+),
+ranked_tags AS (
+    SELECT
+        tc.system,
+        tc.tag,
+        ROW_NUMBER() OVER (PARTITION BY tc.system ORDER BY tc.tag_count DESC, tc.tag) AS tag_rank
+    FROM tag_counts tc
+)
+SELECT
+    pages.system,
+    pages.page_count,
+    ARRAY(
+        SELECT rt.tag FROM ranked_tags rt
+        WHERE rt.system = pages.system AND rt.tag_rank <= 5
+        ORDER BY rt.tag_rank
+    ) AS common_tags,
+    NOW() AS refreshed_at
+FROM (
+    SELECT cp.system, COUNT(*) AS page_count
     FROM construction_pages cp
-    WHERE 
-        to_tsvector('english', cp.content) @@ plainto_tsquery('english', search_query)
-        AND (system_filter IS NULL OR cp.system = system_filter)
-    ORDER BY rank DESC
-    LIMIT limit_results;
+    GROUP BY cp.system
+) pages;
+
+-- Unique index required for REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_construction_system_stats_system ON construction_system_stats(system);
+
+GRANT SELECT ON construction_system_stats TO anon, authenticated;
+
+CREATE OR REPLACE FUNCTION refresh_construction_stats()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY construction_system_stats;
 END;
 $$;
 
+-- A full refresh scans every page: ingest (service role) only
+REVOKE EXECUTE ON FUNCTION refresh_construction_stats() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_construction_stats() TO service_role;
+
+-- Corpus version stamp: bumped by the document processor after each ingest so
+-- API response caches can tell that cached results may be stale
+CREATE TABLE IF NOT EXISTS construction_corpus_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO construction_corpus_version (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+-- Readable by everyone, writable only through bump_construction_corpus_version():
+-- rewriting the stamp would invalidate, or roll back to, cached API responses
+ALTER TABLE construction_corpus_version ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Anyone can read the corpus version" ON construction_corpus_version;
+CREATE POLICY "Anyone can read the corpus version" ON construction_corpus_version
+    FOR SELECT USING (true);
+
+REVOKE INSERT, UPDATE, DELETE, TRUNCATE ON construction_corpus_version FROM PUBLIC, anon, authenticated;
+GRANT SELECT ON construction_corpus_version TO anon, authenticated;
+
+CREATE OR REPLACE FUNCTION bump_construction_corpus_version()
+RETURNS BIGINT
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+    UPDATE construction_corpus_version
+    SET version = version + 1, updated_at = NOW()
+    WHERE id
+    RETURNING version;
+$$;
+
+-- A bump invalidates every API response cache: ingest (service role) only
+REVOKE EXECUTE ON FUNCTION bump_construction_corpus_version() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION bump_construction_corpus_version() TO service_role;
+
 -- Row Level Security
 ALTER TABLE construction_documents ENABLE ROW LEVEL SECURITY;
 ALTER TABLE construction_pages ENABLE ROW LEVEL SECURITY;
 
 -- Policies for authenticated users to read all documents
+DROP POLICY IF EXISTS "Authenticated users can read documents" ON construction_documents;
 CREATE POLICY "Authenticated users can read documents" ON construction_documents
     FOR SELECT USING (auth.role() = 'authenticated');
 
+DROP POLICY IF EXISTS "Authenticated users can read pages" ON construction_pages;
 CREATE POLICY "Authenticated users can read pages" ON construction_pages
     FOR SELECT USING (auth.role() = 'authenticated');
 
 -- Policies for document upload (service role only for now)
+DROP POLICY IF EXISTS "Service role can insert documents" ON construction_documents;
 CREATE POLICY "Service role can insert documents" ON construction_documents
     FOR INSERT WITH CHECK (auth.role() = 'service_role');
 
+DROP POLICY IF EXISTS "Service role can insert pages" ON construction_pages;
 CREATE POLICY "Service role can insert pages" ON construction_pages
     FOR INSERT WITH CHECK (auth.role() = 'service_role');
 
+-- Page rows are written as upserts on unique_page_per_doc
+DROP POLICY IF EXISTS "Service role can update pages" ON construction_pages;
+CREATE POLICY "Service role can update pages" ON construction_pages
+    FOR UPDATE USING (auth.role() = 'service_role');
+
+-- Incremental re-ingest updates documents and removes pages that no longer exist
+DROP POLICY IF EXISTS "Service role can update documents" ON construction_documents;
+CREATE POLICY "Service role can update documents" ON construction_documents
+    FOR UPDATE USING (auth.role() = 'service_role');
+
+DROP POLICY IF EXISTS "Service role can delete pages" ON construction_pages;
+CREATE POLICY "Service role can delete pages" ON construction_pages
+    FOR DELETE USING (auth.role() = 'service_role');
+
 -- Sample data insertion (optional - for testing)
 -- INSERT INTO construction_documents (document_name, document_type, system_category) VALUES
 -- ('HVAC_Installation_Manual_2024.pdf', 'manual', 'HVAC'),
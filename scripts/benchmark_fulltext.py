@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Full-text search benchmark
+Compares the original search_construction_text query (to_tsvector computed
+per row) with the stored, weighted search_vector column on a synthetic
+corpus. Runs in a scratch schema so production tables are untouched.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA = "fts_benchmark"
+
+VOCABULARY = [
+    "installation", "clearance", "compressor", "condenser", "evaporator", "refrigerant",
+    "voltage", "amperage", "breaker", "circuit", "ground", "conduit", "panel", "disconnect",
+    "valve", "pipe", "drain", "pressure", "flow", "pump", "sprinkler", "alarm", "smoke",
+    "damper", "duct", "airflow", "filter", "thermostat", "sensor", "controller", "wiring",
+    "torque", "bracket", "mounting", "inspection", "warranty", "maintenance", "service",
+    "troubleshooting", "error", "fault", "reset", "commissioning", "testing", "startup",
+    "specification", "dimension", "weight", "capacity", "rating", "minimum", "maximum",
+    "the", "and", "unit", "must", "shall", "before", "after", "check", "verify", "replace",
+]
+TAGS = [
+    "diagram", "specifications", "installation", "maintenance", "troubleshooting",
+    "parts-list", "warnings", "requirements", "procedures", "testing", "commissioning",
+    "safety", "dimensions", "electrical", "mechanical", "reference", "table", "checklist",
+    "error-codes", "settings",
+]
+SYSTEMS = ["HVAC", "Electrical", "Plumbing", "Fire-Safety", "Structural", "General"]
+QUERIES = [
+    "installation clearance", "compressor fault", "refrigerant pressure", "breaker panel",
+    "smoke alarm testing", "pump flow", "thermostat wiring", "error reset",
+]
+
+SETUP_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+
+CREATE FUNCTION {SCHEMA}.tags_text(tags TEXT[]) RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT array_to_string(tags, ' '); $$;
+
+CREATE TABLE {SCHEMA}.pages (
+    id BIGSERIAL PRIMARY KEY,
+    document_name TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    system VARCHAR(50) NOT NULL,
+    tags TEXT[] NOT NULL,
+    summary TEXT NOT NULL,
+    content TEXT NOT NULL,
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce({SCHEMA}.tags_text(tags), '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+        setweight(to_tsvector('english', content), 'D')
+    ) STORED
+);
+"""
+
+LOAD_SQL = f"""
+INSERT INTO {SCHEMA}.pages (document_name, page_number, system, tags, summary, content)
+SELECT
+    'Manual_' || (g / 200) || '.pdf',
+    g %% 200 + 1,
+    (%(systems)s::text[])[1 + g %% 6],
+    ARRAY[(%(tags)s::text[])[1 + g %% 20], (%(tags)s::text[])[1 + (g * 7) %% 20]],
+    (SELECT string_agg((%(vocab)s::text[])[1 + floor(random() * %(vocab_size)s)::int], ' ')
+     FROM generate_series(1, 30 + g * 0)),
+    (SELECT string_agg((%(vocab)s::text[])[1 + floor(random() * %(vocab_size)s)::int], ' ')
+     FROM generate_series(1, %(words)s + g * 0))
+FROM generate_series(%(start)s, %(stop)s) g
+"""
+
+INDEX_SQL = f"""
+CREATE INDEX ON {SCHEMA}.pages USING GIN(to_tsvector('english', content));
+CREATE INDEX ON {SCHEMA}.pages USING GIN(search_vector);
+ANALYZE {SCHEMA}.pages;
+"""
+
+# The original search_construction_text body, and the stored-column rewrite
+EXPRESSION_QUERY = f"""
+SELECT id, ts_rank(to_tsvector('english', content), plainto_tsquery('english', %(q)s)) AS rank
+FROM {SCHEMA}.pages
+WHERE to_tsvector('english', content) @@ plainto_tsquery('english', %(q)s)
+ORDER BY rank DESC
+LIMIT 20
+"""
+
+STORED_QUERY = f"""
+SELECT id, ts_rank(search_vector, query) AS rank
+FROM {SCHEMA}.pages, plainto_tsquery('english', %(q)s) query
+WHERE search_vector @@ query
+ORDER BY rank DESC
+LIMIT 20
+"""
+
+
+def time_query(cursor, sql: str, runs: int) -> list:
+    """Latency in ms of each run over all benchmark queries"""
+    timings = []
+    for _ in range(runs):
+        for query in QUERIES:
+            started = time.perf_counter()
+            cursor.execute(sql, {'q': query})
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stored tsvector full-text search")
+    parser.add_argument("--pages", type=int, default=100_000, help="Synthetic pages (default: 100000)")
+    parser.add_argument("--words", type=int, default=300, help="Words per page (default: 300)")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions of the query set (default: 5)")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ DATABASE_URL must be set in .env")
+        sys.exit(1)
+
+    connection = psycopg2.connect(database_url)
+    connection.autocommit = True
+    cursor = connection.cursor()
+
+    try:
+        print(f"🏗️  Building {args.pages:,} synthetic pages in schema {SCHEMA}...")
+        started = time.perf_counter()
+        cursor.execute(SETUP_SQL)
+        batch = 10_000
+        for start in range(1, args.pages + 1, batch):
+            cursor.execute(LOAD_SQL, {
+                'systems': SYSTEMS, 'tags': TAGS, 'vocab': VOCABULARY,
+                'vocab_size': len(VOCABULARY), 'words': args.words,
+                'start': start, 'stop': min(start + batch - 1, args.pages)
+            })
+        cursor.execute(INDEX_SQL)
+        print(f"   Loaded and indexed in {time.perf_counter() - started:.1f}s")
+
+        # Warm the cache for both plans before measuring
+        time_query(cursor, EXPRESSION_QUERY, 1)
+        time_query(cursor, STORED_QUERY, 1)
+
+        print(f"\n{'Query':<28} {'Median ms':>10} {'p95 ms':>10}")
+        print("-" * 50)
+        results = {}
+        for label, sql in (("to_tsvector per row", EXPRESSION_QUERY),
+                           ("stored search_vector", STORED_QUERY)):
+            timings = sorted(time_query(cursor, sql, args.runs))
+            results[label] = statistics.median(timings)
+            print(f"{label:<28} {results[label]:>10.1f} {timings[int(len(timings) * 0.95)]:>10.1f}")
+
+        speedup = results["to_tsvector per row"] / results["stored search_vector"]
+        print(f"\n⚡ Stored column is {speedup:.1f}x faster at the median")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
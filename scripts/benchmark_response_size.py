@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Response size benchmark for the Construction Docs Search API
+Compares bytes on the wire for listing and detail endpoints with every
+column (what select('*') used to send) against the default projections,
+uncompressed and with gzip / brotli.
+"""
+
+import sys
+import asyncio
+import argparse
+
+import httpx
+
+# Everything a page or document row holds, i.e. the old select('*') payloads
+ALL_PAGE_FIELDS = 'id,document_id,document_name,page_number,system,tags,summary,content,content_hash,embedding,created_at'
+ALL_DOCUMENT_FIELDS = ('id,document_name,document_type,system_category,total_pages,file_size,'
+                       'uploaded_at,uploaded_by,project_id,file_fingerprint,metadata')
+
+ENCODINGS = ['identity', 'gzip', 'br']
+
+
+async def wire_size(client: httpx.AsyncClient, path: str, encoding: str) -> int:
+    """Bytes of the response body as sent, before any decompression"""
+    async with client.stream('GET', path, headers={'Accept-Encoding': encoding}) as response:
+        response.raise_for_status()
+        return sum([len(chunk) async for chunk in response.aiter_raw()])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure API response sizes")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Running API")
+    parser.add_argument("--system", default="HVAC", help="System to browse (default: HVAC)")
+    parser.add_argument("--per-page", type=int, default=50, help="Browse page size (default: 50)")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=30.0) as client:
+        listing = (await client.get(f"/browse/{args.system}",
+                                    params={'per_page': 1, 'count': 'none'})).json()
+        if not listing['results']:
+            print(f"❌ No pages for system {args.system}")
+            sys.exit(1)
+        page_id = listing['results'][0]['id']
+
+        browse = f"/browse/{args.system}?per_page={args.per_page}&count=none"
+        cases = [
+            (f"browse x{args.per_page}", f"{browse}&fields={ALL_PAGE_FIELDS}", browse),
+            ("page", f"/page/{page_id}?fields={ALL_PAGE_FIELDS}", f"/page/{page_id}"),
+            ("documents", f"/documents?fields={ALL_DOCUMENT_FIELDS}", "/documents"),
+        ]
+
+        print(f"{'Endpoint':<14} {'Columns':<9} " + ' '.join(f"{encoding:>10}" for encoding in ENCODINGS))
+        print("-" * 58)
+        for label, before_path, after_path in cases:
+            sizes = {}
+            for columns, path in (("all", before_path), ("default", after_path)):
+                sizes[columns] = [await wire_size(client, path, encoding) for encoding in ENCODINGS]
+                print(f"{label:<14} {columns:<9} " + ' '.join(f"{size:>10,}" for size in sizes[columns]))
+            reduction = sizes['all'][0] / max(1, min(sizes['default']))
+            print(f"{'':<14} {'':<9} {reduction:>9.1f}x smaller (default + best encoding vs all columns)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Load test for the Construction Docs Search API
+Fires concurrent requests and reports throughput and latency. With
+--pool-sizes it starts one API server per database pool size so the
+scaling of throughput with SUPABASE_POOL_SIZE can be compared.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import itertools
+import subprocess
+from pathlib import Path
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+async def run_load(base_url: str, path: str, concurrency: int, duration: float) -> dict:
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds
+
+    ``{n}`` in the path is replaced with a request counter, so cached
+    endpoints can be made to miss the response cache.
+    """
+    latencies = []
+    counter = itertools.count()
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def user():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path.replace('{n}', str(next(counter))))
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[user() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    }
+
+
+async def wait_until_up(base_url: str, timeout: float = 120.0):
+    """Poll the health endpoint until the server answers"""
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"API at {base_url} did not start")
+
+
+async def test_pool_size(pool_size: int, port: int, args) -> dict:
+    """Start an API server with the given pool size and load it"""
+    env = dict(os.environ, SUPABASE_POOL_SIZE=str(pool_size))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.construction_search_api:app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_until_up(base_url)
+        # Warm up connections before measuring
+        await run_load(base_url, args.path, args.concurrency, 2.0)
+        return await run_load(base_url, args.path, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_row(label: str, result: dict):
+    print(f"{label:<14} {result['requests']:>9} {result['errors']:>7} "
+          f"{result['requests_per_second']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the search API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000",
+                        help="Running API to test (ignored with --pool-sizes)")
+    parser.add_argument("--path", default="/documents",
+                        help="Request path to hammer (default: /documents, which is not "
+                             "response-cached; {n} is replaced with a request counter)")
+    parser.add_argument("--concurrency", type=int, default=50,
+                        help="Concurrent clients (default: 50)")
+    parser.add_argument("--duration", type=float, default=15.0,
+                        help="Seconds per measurement (default: 15)")
+    parser.add_argument("--pool-sizes", default=None,
+                        help="Comma-separated SUPABASE_POOL_SIZE values to compare, e.g. 1,5,20")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Port for servers started with --pool-sizes (default: 8765)")
+    args = parser.parse_args()
+
+    print(f"🚀 {args.concurrency} concurrent clients on {args.path} for {args.duration:.0f}s")
+    print(f"{'Pool size':<14} {'Requests':>9} {'Errors':>7} {'Req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    print("-" * 62)
+
+    if args.pool_sizes:
+        for pool_size in [int(size) for size in args.pool_sizes.split(',')]:
+            print_row(str(pool_size), await test_pool_size(pool_size, args.port, args))
+    else:
+        print_row("running API", await run_load(args.url, args.path, args.concurrency, args.duration))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
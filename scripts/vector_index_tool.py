@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Vector index tool
+Rebuilds the construction_pages embedding indexes (HNSW or IVFFlat) and
+measures recall@k and latency of the approximate index against exact
+nearest-neighbour search, for a range of ef_search / probes settings.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SAMPLE_SQL = """
+SELECT embedding::text
+FROM construction_pages
+WHERE embedding IS NOT NULL AND (%(system)s IS NULL OR system = %(system)s)
+ORDER BY random()
+LIMIT %(samples)s
+"""
+
+# The system literal is inlined (not a bind parameter) so the planner can
+# pick the matching per-system partial index
+NEAREST_SQL = """
+SELECT id
+FROM construction_pages
+WHERE embedding IS NOT NULL {system_clause}
+ORDER BY embedding <=> %(embedding)s::vector
+LIMIT %(k)s
+"""
+
+INDEX_SQL = """
+SELECT indexdef
+FROM pg_indexes
+WHERE indexname = 'idx_construction_pages_embedding'
+"""
+
+
+def nearest(cursor, embedding: str, k: int, settings: dict, system: str = None) -> tuple:
+    """Top-k ids and latency in ms under transaction-local planner settings"""
+    cursor.execute("BEGIN")
+    try:
+        for name, value in settings.items():
+            cursor.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+        started = time.perf_counter()
+        system_clause = cursor.mogrify("AND system = %s", (system,)).decode() if system else ""
+        cursor.execute(NEAREST_SQL.format(system_clause=system_clause),
+                       {'embedding': embedding, 'k': k})
+        ids = [row[0] for row in cursor.fetchall()]
+        return ids, (time.perf_counter() - started) * 1000
+    finally:
+        cursor.execute("ROLLBACK")
+
+
+def measure_recall(cursor, index_type: str, k: int, samples: int, values: list,
+                   system: str = None):
+    """Print recall@k and latency per ef_search / probes value"""
+    cursor.execute(SAMPLE_SQL, {'samples': samples, 'system': system})
+    queries = [row[0] for row in cursor.fetchall()]
+    if not queries:
+        print("❌ No embedded pages to sample")
+        return
+
+    # Exact results: no index scans, so pgvector falls back to a full sort
+    exact = [nearest(cursor, query, k, {'enable_indexscan': 'off'}, system) for query in queries]
+    exact_ms = statistics.median(latency for _, latency in exact)
+
+    setting = 'hnsw.ef_search' if index_type == 'hnsw' else 'ivfflat.probes'
+    scope = f" in {system}" if system else ""
+    print(f"\n🎯 recall@{k} over {len(queries)} sampled pages{scope}")
+    print(f"{setting:<18} {'Recall':>8} {'Median ms':>10} {'p95 ms':>10}")
+    print("-" * 49)
+    print(f"{'exact':<18} {1.0:>8.3f} {exact_ms:>10.1f} {'':>10}")
+
+    for value in values:
+        recalls = []
+        timings = []
+        for query, (exact_ids, _) in zip(queries, exact):
+            ids, latency = nearest(cursor, query, k, {setting: value}, system)
+            recalls.append(len(set(ids) & set(exact_ids)) / max(1, len(exact_ids)))
+            timings.append(latency)
+        timings.sort()
+        print(f"{value:<18} {statistics.mean(recalls):>8.3f} "
+              f"{statistics.median(timings):>10.1f} {timings[int(len(timings) * 0.95)]:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild and tune the pgvector index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild", help="Rebuild the embedding index")
+    rebuild.add_argument("--type", choices=["hnsw", "ivfflat"], default="hnsw")
+    rebuild.add_argument("--lists", type=int, default=None,
+                         help="IVFFlat lists (default: sized from row count)")
+    rebuild.add_argument("--m", type=int, default=16, help="HNSW m (default: 16)")
+    rebuild.add_argument("--ef-construction", type=int, default=64,
+                         help="HNSW ef_construction (default: 64)")
+
+    recall = subparsers.add_parser("recall", help="Measure recall@k against exact search")
+    recall.add_argument("--k", type=int, default=10, help="Neighbours per query (default: 10)")
+    recall.add_argument("--samples", type=int, default=50,
+                        help="Pages sampled as queries (default: 50)")
+    recall.add_argument("--values", default=None,
+                        help="Comma-separated ef_search (HNSW) or probes (IVFFlat) values")
+    recall.add_argument("--system", default=None,
+                        help="Measure filtered search within one system (uses its partial index)")
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ DATABASE_URL must be set in .env")
+        sys.exit(1)
+
+    connection = psycopg2.connect(database_url)
+    connection.autocommit = True
+    cursor = connection.cursor()
+
+    try:
+        if args.command == "rebuild":
+            print(f"🧭 Rebuilding {args.type} index...")
+            started = time.perf_counter()
+            cursor.execute(
+                "SELECT rebuild_construction_vector_index(%s, %s, %s, %s)",
+                (args.type, args.lists, args.m, args.ef_construction)
+            )
+            print(f"✅ {cursor.fetchone()[0]} ({time.perf_counter() - started:.1f}s)")
+            return
+
+        cursor.execute(INDEX_SQL)
+        row = cursor.fetchone()
+        if not row:
+            print("❌ idx_construction_pages_embedding does not exist - run rebuild first")
+            sys.exit(1)
+        index_type = 'ivfflat' if 'ivfflat' in row[0] else 'hnsw'
+        print(f"📐 {row[0]}")
+
+        default_values = "10,40,100,200" if index_type == 'hnsw' else "1,5,10,20"
+        values = [int(value) for value in (args.values or default_values).split(',')]
+        measure_recall(cursor, index_type, args.k, args.samples, values, args.system)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Async data access for the Construction Docs Search API
+Non-blocking PostgREST calls over a pooled HTTP connection
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+
+class PostgrestError(Exception):
+    """Error response from PostgREST"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class QueryResult:
+    """Rows returned by a query, plus the total count when requested"""
+
+    def __init__(self, data: List[Dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def pg_quote(value) -> str:
+    """Double-quote a filter value so commas and parentheses are literal"""
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def pg_array(values: Sequence[str]) -> str:
+    """Format values as a quoted Postgres array literal for cs./ov. filters"""
+    return '{' + ','.join(pg_quote(value) for value in values) + '}'
+
+
+class AsyncPostgrest:
+    """Pooled async client for the Supabase REST (PostgREST) endpoint
+
+    ``pool_size`` caps concurrent connections; requests beyond it wait
+    for a free connection for up to ``pool_timeout`` seconds. Call
+    ``start()`` before use and ``close()`` on shutdown.
+    """
+
+    def __init__(self, url: str, key: str, pool_size: int = 20,
+                 timeout: float = 10.0, pool_timeout: float = 5.0,
+                 schema: str = 'public'):
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.headers = {
+            'apikey': key,
+            'Authorization': f"Bearer {key}",
+            'Accept-Profile': schema,
+            'Content-Profile': schema
+        }
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.pool_timeout = pool_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Stats
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+
+    async def start(self):
+        """Open the connection pool"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(self.timeout, pool=self.pool_timeout)
+            )
+
+    async def close(self):
+        """Close the connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, method: str, path: str, params=None, json=None,
+                       headers: Optional[Dict] = None) -> httpx.Response:
+        if self._client is None:
+            raise RuntimeError("AsyncPostgrest.start() has not been called")
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            response = await self._client.request(method, path, params=params,
+                                                  json=json, headers=headers)
+        finally:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_latency += time.perf_counter() - started
+
+        if response.status_code >= 400:
+            self.errors += 1
+            try:
+                message = response.json().get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise PostgrestError(response.status_code, message)
+        return response
+
+    async def rpc(self, function: str, params: Dict) -> QueryResult:
+        """Call a Postgres function"""
+        response = await self._request('POST', f"/rpc/{function}", json=params)
+        return QueryResult(response.json())
+
+    async def select(self, table: str, columns: str = '*',
+                     filters: Sequence[Tuple[str, str]] = (),
+                     order: Optional[str] = None, limit: Optional[int] = None,
+                     offset: Optional[int] = None,
+                     count: Optional[str] = None) -> QueryResult:
+        """Read rows from a table
+
+        ``filters`` are PostgREST ``(column, "op.value")`` pairs, e.g.
+        ``('system', 'eq.HVAC')``. ``count`` may be ``'exact'``,
+        ``'planned'`` or ``'estimated'`` to get the total in the same
+        round trip.
+        """
+        params = [('select', columns)]
+        params.extend(filters)
+        if order:
+            params.append(('order', order))
+        if limit is not None:
+            params.append(('limit', str(limit)))
+        if offset:
+            params.append(('offset', str(offset)))
+
+        headers = {'Prefer': f"count={count}"} if count else None
+        response = await self._request('GET', f"/{table}", params=params, headers=headers)
+
+        total = None
+        if count:
+            # Content-Range: 0-19/1234 (or */0 when empty)
+            content_range = response.headers.get('content-range', '')
+            total_text = content_range.rpartition('/')[2]
+            total = int(total_text) if total_text.isdigit() else None
+
+        return QueryResult(response.json(), total)
+
+    def stats(self) -> Dict:
+        """Pool usage statistics"""
+        return {
+            'pool_size': self.pool_size,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'average_latency_ms': round(self.total_latency / self.requests * 1000, 1)
+                                  if self.requests else 0.0
+        }
@@ -4,20 +4,42 @@ Construction Documentation Search API
 FastAPI endpoints for searching technical documentation
 """
 
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional, Dict
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from typing import List, Literal, Optional, Dict
+from pydantic import BaseModel, Field
+from collections import OrderedDict
 import os
-from supabase import create_client, Client
+import sys
+import json
+import time
+import uuid
+import base64
+import asyncio
+import functools
 try:
     from sentence_transformers import SentenceTransformer
     HAS_EMBEDDINGS = True
 except ImportError:
     HAS_EMBEDDINGS = False
     print("⚠️ Sentence transformers not available, semantic search disabled")
+try:
+    from brotli_asgi import BrotliMiddleware
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
 from dotenv import load_dotenv
 
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.construction_doc_processor import EmbeddingService
+from src.construction_db import AsyncPostgrest, pg_array, pg_quote
+from src.response_cache import ResponseCache, CorpusVersion
+
 load_dotenv()
 
 # Initialize FastAPI app
@@ -32,12 +54,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-supabase: Client = create_client(
+# Compress responses over 1 KB: brotli when installed and accepted, else gzip
+if HAS_BROTLI:
+    app.add_middleware(BrotliMiddleware, minimum_size=1000, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Initialize services (pooled, non-blocking PostgREST access)
+db = AsyncPostgrest(
     os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_ANON_KEY")
+    os.getenv("SUPABASE_ANON_KEY"),
+    pool_size=int(os.getenv("SUPABASE_POOL_SIZE", "20")),
+    timeout=float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10")),
+    pool_timeout=float(os.getenv("SUPABASE_POOL_TIMEOUT_SECONDS", "5"))
 )
 
+@app.on_event("startup")
+async def open_database_pool():
+    await db.start()
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    await db.close()
+    embedding_service.close()
+    response_cache.close()
+
 # Initialize embedding model
 if HAS_EMBEDDINGS:
     print("🤖 Loading embedding model...")
@@ -45,6 +86,180 @@ if HAS_EMBEDDINGS:
 else:
     embedding_model = None
 
+# Concurrent semantic queries are encoded together off the event loop
+embedding_service = EmbeddingService(embedding_model, batch_size=16, max_wait_ms=5)
+
+
+class QueryEmbeddingCache:
+    """LRU cache of query embeddings in front of the batching EmbeddingService
+
+    Queries are normalized (lowercased, whitespace collapsed) before
+    lookup. Concurrent misses for the same query share one encode, and
+    distinct misses arriving together are batched by the service.
+    """
+    
+    def __init__(self, service: EmbeddingService, max_entries: int = 2048):
+        self.service = service
+        self.max_entries = max_entries
+        self._cache: OrderedDict = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        return ' '.join(query.lower().split())
+    
+    async def embed(self, query: str) -> List[float]:
+        """Return the embedding for a query, encoding it on a miss"""
+        key = self.normalize(query)
+        
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        
+        future = self._pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            future = self.service.submit(key)
+            self._pending[key] = future
+            future.add_done_callback(lambda done: self._store(key, done))
+        
+        # Shielded so one cancelled request does not cancel a shared encode
+        return await asyncio.shield(future)
+    
+    async def embed_many(self, queries: List[str]) -> List[List[float]]:
+        """Embeddings for several queries; all misses are encoded in one batch"""
+        keys = [self.normalize(query) for query in queries]
+        
+        futures: Dict[str, asyncio.Future] = {}
+        misses = []
+        for key in dict.fromkeys(keys):
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(self._cache[key])
+                futures[key] = future
+            elif key in self._pending:
+                self.coalesced += 1
+                futures[key] = self._pending[key]
+            else:
+                misses.append(key)
+        
+        if misses:
+            self.misses += len(misses)
+            for key, future in zip(misses, self.service.submit_many(misses)):
+                self._pending[key] = future
+                future.add_done_callback(functools.partial(self._store, key))
+                futures[key] = future
+        
+        vectors = await asyncio.shield(asyncio.gather(*futures.values()))
+        by_key = dict(zip(futures.keys(), vectors))
+        return [by_key[key] for key in keys]
+    
+    def _store(self, key: str, future: asyncio.Future):
+        self._pending.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        
+        self._cache[key] = future.result()
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+    
+    def stats(self) -> Dict:
+        """Hit rate and batching statistics"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            'encoder': self.service.stats()
+        }
+
+
+query_embeddings = QueryEmbeddingCache(
+    embedding_service,
+    max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+)
+
+# Search backend: 'supabase' (default) or 'local', an on-disk snapshot that
+# works without a connection (see src/local_search.py)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "supabase").lower()
+if SEARCH_BACKEND == 'local':
+    from src.local_search import LocalVectorIndex, LocalTextIndex, TEXT_INDEX_FILE
+    local_search_path = os.getenv("LOCAL_SEARCH_PATH", ".cache/local_search")
+    local_search_mmap = os.getenv("LOCAL_SEARCH_MMAP", "1") != "0"
+    print(f"📂 Loading local search snapshot from {local_search_path}...")
+    local_index = LocalVectorIndex.load(local_search_path, mmap=local_search_mmap)
+    local_text_index = LocalTextIndex.load(os.path.join(local_search_path, TEXT_INDEX_FILE),
+                                           mmap=local_search_mmap)
+else:
+    local_index = None
+    local_text_index = None
+
+# Cached responses for text, tag and browse requests, invalidated by the
+# corpus version the document processor bumps after each ingest
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300")),
+    shared_path=os.getenv("RESPONSE_CACHE_SHARED_PATH") or None
+)
+
+async def fetch_corpus_version():
+    if local_text_index is not None:
+        # The snapshot only changes when the API restarts with a new one
+        return f"local-{local_text_index.created_at}"
+    result = await db.select('construction_corpus_version', columns='version', limit=1)
+    return result.data[0]['version'] if result.data else 0
+
+corpus_version = CorpusVersion(
+    fetch_corpus_version,
+    interval=float(os.getenv("CORPUS_VERSION_POLL_SECONDS", "5"))
+)
+
+def normalize_query(query: str) -> str:
+    return ' '.join(query.split())
+
+def if_none_match(request: Request) -> set:
+    """ETags listed in the If-None-Match header (weak or strong)"""
+    header = request.headers.get('if-none-match', '')
+    tags = {tag.strip() for tag in header.split(',') if tag.strip()}
+    return {tag[2:] if tag.startswith('W/') else tag for tag in tags}
+
+async def cached_json(request: Request, endpoint: str, params: Dict, build) -> Response:
+    """Serve a JSON response from the response cache, building it on a miss
+
+    Answers 304 Not Modified when the client already holds the same body.
+    """
+    key = response_cache.make_key(await corpus_version.current(), endpoint, params)
+    entry = await response_cache.get(key)
+    if entry is None:
+        payload = jsonable_encoder(await build())
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        etag = response_cache.make_etag(body)
+        await response_cache.set(key, etag, body)
+    else:
+        etag, body = entry
+    
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    client_etags = if_none_match(request)
+    if etag in client_etags or '*' in client_etags:
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "20"))
+
 # Response models
 class SearchResult(BaseModel):
     id: str
@@ -55,12 +270,37 @@ class SearchResult(BaseModel):
     summary: str
     similarity: Optional[float] = None
     rank: Optional[float] = None
+    score: Optional[float] = None
+    snippet: Optional[str] = None
+    document_hits: Optional[int] = None
 
 class SearchResponse(BaseModel):
     query: str
     system_filter: Optional[str]
     results: List[SearchResult]
     total_results: int
+    next_cursor: Optional[str] = None
+
+class BatchQuery(BaseModel):
+    type: Literal['text', 'semantic', 'hybrid', 'tags']
+    q: Optional[str] = None
+    tags: Optional[List[str]] = None
+    system: Optional[str] = None
+    limit: int = Field(10, ge=1, le=50)
+    threshold: float = Field(0.5, ge=0, le=1)
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+
+class BatchSearchResult(BaseModel):
+    type: str
+    status: Literal['ok', 'error']
+    response: Optional[SearchResponse] = None
+    error: Optional[str] = None
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]
+    failed: int
 
 class SystemInfo(BaseModel):
     system: str
@@ -78,58 +318,146 @@ async def root():
         "endpoints": [
             "/search/text",
             "/search/tags", 
+            "/search/tags/export",
             "/search/semantic",
+            "/search/hybrid",
+            "/search/batch",
             "/browse/{system}",
             "/systems",
-            "/documents"
+            "/documents",
+            "/stats"
         ]
     }
 
+@app.get("/stats")
+async def get_stats():
+    """
+    Runtime statistics for caches and batching
+    """
+    return {
+        'search_backend': SEARCH_BACKEND,
+        'query_embeddings': query_embeddings.stats(),
+        'response_cache': dict(response_cache.stats(), corpus_version=corpus_version.value),
+        'database': db.stats(),
+        'local_search': local_index.stats() if local_index else None,
+        'local_text_search': local_text_index.stats() if local_text_index else None
+    }
+
+async def text_search(q: str, system: Optional[str], limit: int,
+                      collapse: bool = False, snippets: bool = True) -> SearchResponse:
+    """Full-text search against the local index or Supabase"""
+    if local_text_index is not None:
+        # BM25 over the local snapshot, off the event loop. The snapshot
+        # holds no page text, so there are no snippets
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(local_text_index.search, q, limit, system,
+                                    collapse=collapse)
+        )
+    else:
+        # Use Supabase RPC function for full-text search
+        result = await db.rpc('search_construction_text', {
+            'search_query': q,
+            'system_filter': system,
+            'limit_results': limit,
+            'collapse_documents': collapse,
+            'with_snippets': snippets
+        })
+        rows = result.data
+    
+    results = []
+    for item in rows:
+        results.append(SearchResult(
+            id=item['id'],
+            document_name=item['document_name'],
+            page_number=item['page_number'],
+            system=item['system'],
+            tags=item['tags'],
+            summary=item['summary'],
+            rank=item.get('rank'),
+            snippet=item.get('snippet'),
+            document_hits=item.get('document_hits')
+        ))
+    
+    return SearchResponse(
+        query=q,
+        system_filter=system,
+        results=results,
+        total_results=len(results)
+    )
+
 @app.get("/search/text", response_model=SearchResponse)
 async def search_text(
+    request: Request,
     q: str = Query(..., description="Search query"),
     system: Optional[str] = Query(None, description="Filter by system (HVAC, Electrical, etc.)"),
-    limit: int = Query(20, ge=1, le=100, description="Maximum results to return")
+    limit: int = Query(20, ge=1, le=100, description="Maximum results to return"),
+    collapse: bool = Query(False, description="Only the best page per document"),
+    snippets: bool = Query(True, description="Include highlighted snippets")
 ):
     """
     Full-text search across all documentation
     """
     try:
-        # Use Supabase RPC function for full-text search
-        result = supabase.rpc('search_construction_text', {
-            'search_query': q,
-            'system_filter': system,
-            'limit_results': limit
-        }).execute()
-        
-        results = []
-        for item in result.data:
-            results.append(SearchResult(
-                id=item['id'],
-                document_name=item['document_name'],
-                page_number=item['page_number'],
-                system=item['system'],
-                tags=item['tags'],
-                summary=item['summary'],
-                rank=item.get('rank')
-            ))
-        
-        return SearchResponse(
-            query=q,
-            system_filter=system,
-            results=results,
-            total_results=len(results)
-        )
+        q = normalize_query(q)
+        params = {'q': q, 'system': system, 'limit': limit, 'collapse': collapse, 'snippets': snippets}
+        return await cached_json(request, 'search_text', params,
+                                 lambda: text_search(q, system, limit, collapse, snippets))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def semantic_search(q: str, query_embedding: List[float], system: Optional[str],
+                          threshold: float, limit: int, ef_search: Optional[int] = None,
+                          probes: Optional[int] = None,
+                          tags: Optional[List[str]] = None) -> SearchResponse:
+    """Nearest pages to an already encoded query"""
+    if local_index is not None:
+        # Exact in-process search over the snapshot, off the event loop
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(local_index.search, query_embedding, limit,
+                                    threshold, system, tags)
+        )
+    else:
+        # Use Supabase RPC function for semantic search
+        result = await db.rpc('search_construction_pages', {
+            'query_embedding': query_embedding,
+            'match_threshold': threshold,
+            'match_count': limit,
+            'system_filter': system,
+            'ef_search': ef_search,
+            'probes': probes,
+            'tag_filter': tags
+        })
+        rows = result.data
+    
+    results = []
+    for item in rows:
+        results.append(SearchResult(
+            id=item['id'],
+            document_name=item['document_name'],
+            page_number=item['page_number'],
+            system=item['system'],
+            tags=item['tags'],
+            summary=item['summary'],
+            similarity=item['similarity']
+        ))
+    
+    return SearchResponse(
+        query=q,
+        system_filter=system,
+        results=results,
+        total_results=len(results)
+    )
+
 @app.get("/search/semantic", response_model=SearchResponse)
 async def search_semantic(
     q: str = Query(..., description="Search query"),
     system: Optional[str] = Query(None, description="Filter by system"),
     threshold: float = Query(0.5, ge=0, le=1, description="Similarity threshold"),
-    limit: int = Query(10, ge=1, le=50, description="Maximum results")
+    limit: int = Query(10, ge=1, le=50, description="Maximum results"),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (higher = better recall, slower)"),
+    probes: Optional[int] = Query(None, ge=1, le=1000, description="IVFFlat lists probed (higher = better recall, slower)"),
+    tags: Optional[List[str]] = Query(None, description="Only pages with any of these tags")
 ):
     """
     Semantic similarity search using embeddings
@@ -139,117 +467,398 @@ async def search_semantic(
     
     try:
         # Generate embedding for query
-        query_embedding = embedding_model.encode(q).tolist()
-        
-        # Use Supabase RPC function for semantic search
-        result = supabase.rpc('search_construction_pages', {
-            'query_embedding': query_embedding,
-            'match_threshold': threshold,
-            'match_count': limit,
-            'system_filter': system
-        }).execute()
+        query_embedding = await query_embeddings.embed(q)
+        return await semantic_search(q, query_embedding, system, threshold, limit,
+                                     ef_search, probes, tags)
         
-        results = []
-        for item in result.data:
-            results.append(SearchResult(
-                id=item['id'],
-                document_name=item['document_name'],
-                page_number=item['page_number'],
-                system=item['system'],
-                tags=item['tags'],
-                summary=item['summary'],
-                similarity=item['similarity']
-            ))
-        
-        return SearchResponse(
-            query=q,
-            system_filter=system,
-            results=results,
-            total_results=len(results)
-        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def hybrid_search(q: str, query_embedding: List[float], system: Optional[str],
+                        limit: int, full_text_weight: float = 1.0,
+                        semantic_weight: float = 1.0, rrf_k: int = 50,
+                        snippets: bool = True) -> SearchResponse:
+    """Full-text and semantic rankings fused in one RPC"""
+    # One RPC ranks both candidate lists and fuses them
+    result = await db.rpc('search_construction_hybrid', {
+        'query_text': q,
+        'query_embedding': query_embedding,
+        'match_count': limit,
+        'system_filter': system,
+        'full_text_weight': full_text_weight,
+        'semantic_weight': semantic_weight,
+        'rrf_k': rrf_k,
+        'with_snippets': snippets
+    })
+    
+    results = []
+    for item in result.data:
+        results.append(SearchResult(
+            id=item['id'],
+            document_name=item['document_name'],
+            page_number=item['page_number'],
+            system=item['system'],
+            tags=item['tags'],
+            summary=item['summary'],
+            rank=item.get('rank'),
+            similarity=item.get('similarity'),
+            score=item['score'],
+            snippet=item.get('snippet')
+        ))
+    
+    return SearchResponse(
+        query=q,
+        system_filter=system,
+        results=results,
+        total_results=len(results)
+    )
+
+@app.get("/search/hybrid", response_model=SearchResponse)
+async def search_hybrid(
+    q: str = Query(..., description="Search query"),
+    system: Optional[str] = Query(None, description="Filter by system"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum results"),
+    full_text_weight: float = Query(1.0, ge=0, le=10, description="Weight of the full-text ranking"),
+    semantic_weight: float = Query(1.0, ge=0, le=10, description="Weight of the semantic ranking"),
+    rrf_k: int = Query(50, ge=1, le=1000, description="Reciprocal rank fusion smoothing constant"),
+    snippets: bool = Query(True, description="Include highlighted snippets")
+):
+    """
+    Full-text and semantic search fused in the database (reciprocal rank fusion)
+    """
+    if not HAS_EMBEDDINGS:
+        raise HTTPException(status_code=503, detail="Hybrid search not available - embeddings disabled")
+    
+    try:
+        query_embedding = await query_embeddings.embed(q)
+        return await hybrid_search(q, query_embedding, system, limit,
+                                   full_text_weight, semantic_weight, rrf_k, snippets)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def tag_search_params(tags: List[str], system: Optional[str], limit: int,
+                      cursor: Optional[str]) -> Dict:
+    """search_by_tags arguments for one page of results"""
+    params = {
+        'search_tags': tags,
+        'system_filter': system,
+        'limit_results': limit
+    }
+    if cursor:
+        matches, document_name, page_number, page_id = decode_cursor(cursor, TAG_CURSOR_KEYS)
+        params.update({
+            'after_matches': matches,
+            'after_document_name': document_name,
+            'after_page_number': page_number,
+            'after_id': page_id
+        })
+    return params
+
+async def tag_search(tags: List[str], system: Optional[str], limit: int,
+                     cursor: Optional[str]) -> SearchResponse:
+    """Pages carrying any of the tags, most matching tags first"""
+    # Use Supabase RPC function for tag search
+    result = await db.rpc('search_by_tags', tag_search_params(tags, system, limit, cursor))
+    
+    results = []
+    for item in result.data:
+        results.append(SearchResult(
+            id=item['id'],
+            document_name=item['document_name'],
+            page_number=item['page_number'],
+            system=item['system'],
+            tags=item['tags'],
+            summary=item['summary']
+        ))
+    
+    return SearchResponse(
+        query=f"tags: {', '.join(tags)}",
+        system_filter=system,
+        results=results,
+        total_results=len(results),
+        next_cursor=encode_cursor(result.data[-1], TAG_CURSOR_KEYS) if len(result.data) == limit else None
+    )
+
 @app.get("/search/tags", response_model=SearchResponse)
 async def search_by_tags(
+    request: Request,
     tags: List[str] = Query(..., description="Tags to search for"),
-    system: Optional[str] = Query(None, description="Filter by system")
+    system: Optional[str] = Query(None, description="Filter by system"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum results per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous response")
 ):
     """
     Search pages by tags (e.g., 'diagram', 'installation', 'troubleshooting')
+
+    Results are ordered by the number of matching tags, then document
+    and page. Pass ``next_cursor`` back as ``cursor`` for the next page;
+    ``/search/tags/export`` streams every match.
     """
     try:
-        # Use Supabase RPC function for tag search
-        result = supabase.rpc('search_by_tags', {
-            'search_tags': tags,
-            'system_filter': system
-        }).execute()
-        
-        results = []
-        for item in result.data:
-            results.append(SearchResult(
-                id=item['id'],
-                document_name=item['document_name'],
-                page_number=item['page_number'],
-                system=item['system'],
-                tags=item['tags'],
-                summary=item['summary']
-            ))
-        
-        return SearchResponse(
-            query=f"tags: {', '.join(tags)}",
-            system_filter=system,
-            results=results,
-            total_results=len(results)
-        )
+        # Tag order does not change the results, so it does not split the cache
+        tags = sorted(set(tags))
+        params = {'tags': tags, 'system': system, 'limit': limit, 'cursor': cursor}
+        return await cached_json(request, 'search_tags', params,
+                                 lambda: tag_search(tags, system, limit, cursor))
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/search/tags/export")
+async def export_by_tags(
+    tags: List[str] = Query(..., description="Tags to search for"),
+    system: Optional[str] = Query(None, description="Filter by system"),
+    batch_size: int = Query(500, ge=50, le=2000, description="Rows fetched per database round trip")
+):
+    """
+    Stream every page matching the tags as NDJSON (one result per line)
+
+    Rows come in id order, not ranked like /search/tags: paging the
+    ranked order re-sorts every match per batch, which grows
+    quadratically for common tags. Each batch is a keyset step on the
+    primary key, so the whole export is one pass over the matches and
+    memory stays bounded however common the tag is.
+    """
+    tags = sorted(set(tags))
+    filters = [('tags', f"ov.{pg_array(tags)}")]
+    if system:
+        filters.append(('system', f"eq.{system}"))
+    
+    async def lines():
+        last_id = None
+        while True:
+            page_filters = filters + ([('id', f"gt.{last_id}")] if last_id else [])
+            result = await db.select('construction_pages',
+                                     columns='id,document_name,page_number,system,tags,summary',
+                                     filters=page_filters, order='id.asc', limit=batch_size)
+            for item in result.data:
+                item['tag_matches'] = sum(1 for tag in item['tags'] or [] if tag in tags)
+                yield json.dumps(item, separators=(',', ':')) + '\n'
+            if len(result.data) < batch_size:
+                break
+            last_id = result.data[-1]['id']
+    
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(batch: BatchSearchRequest):
+    """
+    Run several text, semantic, hybrid and tag searches in one request
+
+    All semantic and hybrid queries are encoded in one batch, the
+    database lookups run concurrently, and results come back in request
+    order. A failing query is reported in its own slot without failing
+    the others.
+    """
+    queries = batch.queries
+    
+    # One encode for every query that needs an embedding
+    embedded = [index for index, query in enumerate(queries)
+                if query.type in ('semantic', 'hybrid') and query.q]
+    embeddings: Dict[int, List[float]] = {}
+    embedding_error = None
+    if embedded and HAS_EMBEDDINGS:
+        try:
+            vectors = await query_embeddings.embed_many([queries[index].q for index in embedded])
+            embeddings = dict(zip(embedded, vectors))
+        except Exception as e:
+            embedding_error = f"Embedding failed: {e}"
+    
+    async def run(index: int, query: BatchQuery) -> SearchResponse:
+        if query.type == 'tags':
+            if not query.tags:
+                raise ValueError("tags query needs 'tags'")
+            return await tag_search(sorted(set(query.tags)), query.system, query.limit, None)
+        
+        if not query.q:
+            raise ValueError(f"{query.type} query needs 'q'")
+        if query.type == 'text':
+            return await text_search(normalize_query(query.q), query.system, query.limit)
+        if not HAS_EMBEDDINGS:
+            raise ValueError("Semantic search not available - embeddings disabled")
+        if embedding_error:
+            raise ValueError(embedding_error)
+        if query.type == 'semantic':
+            return await semantic_search(query.q, embeddings[index], query.system,
+                                         query.threshold, query.limit)
+        return await hybrid_search(query.q, embeddings[index], query.system, query.limit)
+    
+    outcomes = await asyncio.gather(*[run(index, query) for index, query in enumerate(queries)],
+                                    return_exceptions=True)
+    
+    results = []
+    for query, outcome in zip(queries, outcomes):
+        if isinstance(outcome, Exception):
+            results.append(BatchSearchResult(type=query.type, status='error', error=str(outcome)))
+        else:
+            results.append(BatchSearchResult(type=query.type, status='ok', response=outcome))
+    
+    return BatchSearchResponse(
+        results=results,
+        failed=sum(1 for result in results if result.status == 'error')
+    )
+
+# Columns returned when listing pages (no full content or embedding)
+LISTING_COLUMNS = 'id,document_id,document_name,page_number,system,tags,summary'
+# A single page: full text, but no embedding unless asked for with fields=
+PAGE_COLUMNS = 'id,document_id,document_name,page_number,system,tags,summary,content,created_at'
+DOCUMENT_COLUMNS = 'id,document_name,document_type,system_category,total_pages,file_size,uploaded_at'
+
+# Columns that may be requested with fields=
+PAGE_FIELDS = ('id', 'document_id', 'document_name', 'page_number', 'system', 'tags',
+               'summary', 'content', 'content_hash', 'embedding', 'created_at')
+DOCUMENT_FIELDS = ('id', 'document_name', 'document_type', 'system_category', 'total_pages',
+                   'file_size', 'uploaded_at', 'uploaded_by', 'project_id',
+                   'file_fingerprint', 'metadata')
+
+def parse_fields(fields: Optional[str], default: str, allowed: tuple) -> List[str]:
+    """Columns for a fields= parameter, or the endpoint's default projection"""
+    if not fields:
+        return default.split(',')
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+    unknown = [field for field in requested if field not in allowed]
+    if unknown or not requested:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(allowed)}")
+    return requested
+
+# Exact browse totals, reused for a short while: (system, tag) -> (count, fetched_at).
+# Keys come from the request, so the cache is a bounded LRU
+browse_count_cache: OrderedDict = OrderedDict()
+BROWSE_COUNT_TTL = float(os.getenv("BROWSE_COUNT_TTL_SECONDS", "60"))
+BROWSE_COUNT_CACHE_SIZE = int(os.getenv("BROWSE_COUNT_CACHE_SIZE", "256"))
+
+# Keyset positions: browse listings and tag search results
+BROWSE_CURSOR_KEYS = ('document_name', 'page_number', 'id')
+TAG_CURSOR_KEYS = ('tag_matches', 'document_name', 'page_number', 'id')
+# Page ids are validated as UUIDs: they end up unquoted in PostgREST filters
+CURSOR_TYPES = {'document_name': str, 'page_number': int, 'tag_matches': int,
+                'id': lambda value: str(uuid.UUID(value))}
+
+def encode_cursor(row: Dict, keys: tuple = BROWSE_CURSOR_KEYS) -> str:
+    """Opaque cursor for the position after ``row``"""
+    position = [row[key] for key in keys]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str, keys: tuple = BROWSE_CURSOR_KEYS) -> tuple:
+    """Inverse of encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        if len(position) != len(keys):
+            raise ValueError("wrong cursor length")
+        return tuple(CURSOR_TYPES[key](value) for key, value in zip(keys, position))
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def browse_total(system: str, tag: Optional[str], filters: List, mode: str) -> Optional[int]:
+    """Total rows for a browse listing according to the count mode"""
+    if mode == 'none':
+        return None
+    
+    key = (system, tag)
+    if mode == 'cached':
+        cached = browse_count_cache.get(key)
+        if cached and time.monotonic() - cached[1] < BROWSE_COUNT_TTL:
+            browse_count_cache.move_to_end(key)
+            return cached[0]
+    
+    # Ask for the count only (limit 0 keeps the response empty)
+    result = await db.select('construction_pages', columns='id', filters=filters,
+                             limit=0, count='estimated' if mode == 'estimated' else 'exact')
+    if mode == 'cached' and result.count is not None:
+        browse_count_cache[key] = (result.count, time.monotonic())
+        browse_count_cache.move_to_end(key)
+        while len(browse_count_cache) > BROWSE_COUNT_CACHE_SIZE:
+            browse_count_cache.popitem(last=False)
+    return result.count
+
+async def browse_listing(system: str, tag: Optional[str], page: int, per_page: int,
+                         cursor: Optional[str], count: str, columns: List[str]) -> Dict:
+    """One page of a system's pages in document order"""
+    # The cursor is built from these, so select them even when not requested
+    cursor_columns = [column for column in ('document_name', 'page_number', 'id')
+                      if column not in columns]
+    # Build query
+    filters = [('system', f"eq.{system}")]
+    
+    # Add tag filter if provided
+    if tag:
+        filters.append(('tags', f"cs.{pg_array([tag])}"))
+    
+    # Keyset: rows strictly after (document_name, page_number, id) of the cursor
+    page_filters = list(filters)
+    offset = None
+    if cursor:
+        document_name, page_number, page_id = decode_cursor(cursor)
+        name = pg_quote(document_name)
+        page_filters.append(('or', (
+            f"(document_name.gt.{name},"
+            f"and(document_name.eq.{name},page_number.gt.{page_number}),"
+            f"and(document_name.eq.{name},page_number.eq.{page_number},id.gt.{page_id}))"
+        )))
+    else:
+        offset = (page - 1) * per_page
+    
+    result, total_count = await asyncio.gather(
+        db.select(
+            'construction_pages',
+            columns=','.join(columns + cursor_columns),
+            filters=page_filters,
+            order='document_name.asc,page_number.asc,id.asc',
+            limit=per_page,
+            offset=offset
+        ),
+        browse_total(system, tag, filters, count)
+    )
+    
+    next_cursor = encode_cursor(result.data[-1]) if len(result.data) == per_page else None
+    for row in result.data:
+        for column in cursor_columns:
+            del row[column]
+    
+    return {
+        'system': system,
+        'tag_filter': tag,
+        'page': None if cursor else page,
+        'per_page': per_page,
+        'total_pages': (total_count + per_page - 1) // per_page if total_count is not None else None,
+        'total_results': total_count,
+        'next_cursor': next_cursor,
+        'results': result.data
+    }
+
 @app.get("/browse/{system}")
 async def browse_system(
+    request: Request,
     system: str,
     tag: Optional[str] = Query(None, description="Filter by specific tag"),
-    page: int = Query(1, ge=1, description="Page number"),
-    per_page: int = Query(20, ge=1, le=100, description="Results per page")
+    page: int = Query(1, ge=1, description="Page number (offset pagination)"),
+    per_page: int = Query(20, ge=1, le=100, description="Results per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous response (keyset pagination)"),
+    count: str = Query("cached", pattern="^(exact|estimated|cached|none)$",
+                       description="Total count: exact, estimated (planner), cached (exact, reused briefly) or none"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns (default: listing columns, no content)")
 ):
     """
     Browse all pages for a specific system
+
+    Results are ordered by document name and page number. Pass the
+    returned ``next_cursor`` as ``cursor`` to fetch the following page at
+    constant cost; ``page`` keeps the older offset-based paging.
     """
     try:
-        # Build query
-        query = supabase.table('construction_pages').select('*').eq('system', system)
-        
-        # Add tag filter if provided
-        if tag:
-            query = query.contains('tags', [tag])
-        
-        # Add pagination
-        offset = (page - 1) * per_page
-        query = query.order('document_name', desc=False).order('page_number', desc=False)
-        query = query.range(offset, offset + per_page - 1)
-        
-        result = query.execute()
-        
-        # Get total count
-        count_query = supabase.table('construction_pages').select('id', count='exact').eq('system', system)
-        if tag:
-            count_query = count_query.contains('tags', [tag])
-        count_result = count_query.execute()
-        
-        total_count = count_result.count if hasattr(count_result, 'count') else len(result.data)
-        
-        return {
-            'system': system,
-            'tag_filter': tag,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': (total_count + per_page - 1) // per_page,
-            'total_results': total_count,
-            'results': result.data
-        }
+        columns = parse_fields(fields, LISTING_COLUMNS, PAGE_FIELDS)
+        params = {'system': system, 'tag': tag, 'page': None if cursor else page,
+                  'per_page': per_page, 'cursor': cursor, 'count': count, 'fields': columns}
+        return await cached_json(request, 'browse', params,
+                                 lambda: browse_listing(system, tag, page, per_page, cursor, count, columns))
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -259,88 +868,68 @@ async def get_systems():
     Get list of all systems with page counts and common tags
     """
     try:
-        # Get unique systems with counts
-        result = supabase.table('construction_pages').select('system').execute()
-        
-        # Count pages per system and get common tags
-        systems_data = {}
-        for row in result.data:
-            system = row['system']
-            if system not in systems_data:
-                systems_data[system] = {'count': 0, 'tags': {}}
-            systems_data[system]['count'] += 1
-        
-        # Get common tags per system
-        for system in systems_data:
-            tags_result = supabase.table('construction_pages')\
-                .select('tags')\
-                .eq('system', system)\
-                .limit(100)\
-                .execute()
-            
-            tag_counts = {}
-            for row in tags_result.data:
-                for tag in row['tags']:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
-            
-            # Get top 5 tags
-            common_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-            systems_data[system]['tags'] = [tag[0] for tag in common_tags]
+        # Precomputed per-system counts and top tags (construction_system_stats)
+        result = await db.select('construction_system_stats',
+                                 columns='system,page_count,common_tags',
+                                 order='page_count.desc')
         
-        # Format response
-        response = []
-        for system, data in systems_data.items():
-            response.append(SystemInfo(
-                system=system,
-                page_count=data['count'],
-                common_tags=data['tags']
-            ))
-        
-        return sorted(response, key=lambda x: x.page_count, reverse=True)
+        return [
+            SystemInfo(
+                system=row['system'],
+                page_count=row['page_count'],
+                common_tags=row['common_tags'] or []
+            )
+            for row in result.data
+        ]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/documents")
 async def get_documents(
-    system: Optional[str] = Query(None, description="Filter by system")
+    system: Optional[str] = Query(None, description="Filter by system"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns (default: summary columns, no metadata)")
 ):
     """
     Get list of all uploaded documents
     """
     try:
-        query = supabase.table('construction_documents').select('*')
+        columns = parse_fields(fields, DOCUMENT_COLUMNS, DOCUMENT_FIELDS)
+        filters = [('system_category', f"eq.{system}")] if system else []
         
-        if system:
-            query = query.eq('system_category', system)
-        
-        result = query.order('uploaded_at', desc=True).execute()
+        result = await db.select('construction_documents', columns=','.join(columns),
+                                 filters=filters, order='uploaded_at.desc')
         
         return {
             'total_documents': len(result.data),
             'documents': result.data
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/page/{page_id}")
-async def get_page_content(page_id: str):
+async def get_page_content(
+    page_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated columns (embedding only when listed)")
+):
     """
     Get full content of a specific page
     """
     try:
-        result = supabase.table('construction_pages')\
-            .select('*')\
-            .eq('id', page_id)\
-            .single()\
-            .execute()
+        columns = parse_fields(fields, PAGE_COLUMNS, PAGE_FIELDS)
+        result = await db.select('construction_pages', columns=','.join(columns),
+                                 filters=[('id', f"eq.{page_id}")], limit=1)
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Page not found")
         
-        return result.data
+        return result.data[0]
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
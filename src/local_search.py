@@ -0,0 +1,725 @@
+#!/usr/bin/env python3
+"""
+Local search backend for the Construction Docs Search API
+Serves semantic and full-text search from an on-disk snapshot of
+construction_pages so the API keeps working on job sites without a
+connection to Supabase
+"""
+
+import os
+import sys
+import re
+import json
+import time
+import struct
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.construction_db import AsyncPostgrest
+
+SNAPSHOT_VERSION = 1
+# Tag-filtered searches gather rows only when they are under 1/GATHER_FRACTION
+# of the scanned range; otherwise the contiguous range is scored
+GATHER_FRACTION = 16
+
+# Page metadata kept in the snapshot (everything a SearchResult needs)
+SNAPSHOT_COLUMNS = ['id', 'document_name', 'page_number', 'system', 'tags', 'summary']
+
+
+class LocalVectorIndex:
+    """Exact cosine top-k over a contiguous float32 embedding matrix
+
+    Rows are stored sorted by system, so a system filter is a zero-copy
+    slice of the matrix. Tag filters select rows from a per-tag index
+    before scoring. Embeddings are L2-normalized when the snapshot is
+    written, so similarity is a single matrix-vector product.
+    """
+
+    def __init__(self, embeddings: np.ndarray, pages: List[Dict]):
+        if len(embeddings) != len(pages):
+            raise ValueError(f"{len(embeddings)} embeddings for {len(pages)} pages")
+
+        self.embeddings = embeddings
+        self.pages = pages
+        self.created_at: Optional[str] = None
+
+        # system -> (start, stop) row range; rows are grouped by system
+        self.system_ranges: Dict[str, tuple] = {}
+        for row, page in enumerate(pages):
+            start, _ = self.system_ranges.get(page['system'], (row, row))
+            self.system_ranges[page['system']] = (start, row + 1)
+
+        # tag -> sorted row numbers
+        tag_rows: Dict[str, List[int]] = {}
+        for row, page in enumerate(pages):
+            for tag in page['tags'] or []:
+                tag_rows.setdefault(tag, []).append(row)
+        self.tag_rows = {tag: np.array(rows, dtype=np.int64) for tag, rows in tag_rows.items()}
+
+        # Stats
+        self.searches = 0
+        self.total_latency = 0.0
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'LocalVectorIndex':
+        """Open a snapshot directory written by ``save``
+
+        With ``mmap`` the embedding matrix is paged in from disk on demand
+        instead of being read into memory up front.
+        """
+        directory = Path(path)
+        with open(directory / 'pages.json', encoding='utf-8') as file:
+            snapshot = json.load(file)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {snapshot.get('version')} in {path}")
+
+        embeddings = np.load(directory / 'embeddings.npy', mmap_mode='r' if mmap else None)
+        index = cls(embeddings, snapshot['pages'])
+        index.created_at = snapshot.get('created_at')
+        return index
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Dict]) -> 'LocalVectorIndex':
+        """Build an index from page rows that carry an ``embedding``"""
+        rows = sorted((row for row in rows if row.get('embedding') is not None),
+                      key=lambda row: (row['system'], row['document_name'], row['page_number']))
+
+        embeddings = np.array([row['embedding'] for row in rows], dtype=np.float32)
+        if len(rows) == 0:
+            embeddings = embeddings.reshape(0, 0)
+        else:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+
+        pages = [{column: row[column] for column in SNAPSHOT_COLUMNS} for row in rows]
+        return cls(np.ascontiguousarray(embeddings), pages)
+
+    def updated(self, rows: Sequence[Dict], removed_ids: set) -> 'LocalVectorIndex':
+        """A new index without ``removed_ids`` and with ``rows`` added"""
+        kept = [dict(page, embedding=self.embeddings[row])
+                for row, page in enumerate(self.pages) if page['id'] not in removed_ids]
+        return self.from_rows(kept + list(rows))
+
+    def save(self, path: str):
+        """Write the snapshot: embeddings.npy plus pages.json"""
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # Write to temporary names first so a running API never sees half a snapshot
+        np.save(directory / 'embeddings.tmp.npy', np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        with open(directory / 'pages.tmp.json', 'w', encoding='utf-8') as file:
+            json.dump({
+                'version': SNAPSHOT_VERSION,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'pages': self.pages
+            }, file)
+        os.replace(directory / 'embeddings.tmp.npy', directory / 'embeddings.npy')
+        os.replace(directory / 'pages.tmp.json', directory / 'pages.json')
+
+    def search(self, query_embedding: Sequence[float], limit: int = 10,
+               threshold: float = 0.0, system: Optional[str] = None,
+               tags: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Top ``limit`` pages by cosine similarity above ``threshold``
+
+        ``tags`` matches pages carrying any of the given tags, like
+        search_by_tags.
+        """
+        started = time.perf_counter()
+
+        if system is not None:
+            if system not in self.system_ranges:
+                return []
+            start, stop = self.system_ranges[system]
+        else:
+            start, stop = 0, len(self.pages)
+        if start == stop:
+            # Empty snapshot: a (0, 0) matrix cannot be multiplied with the query
+            return []
+
+        rows = None
+        if tags:
+            matches = [self.tag_rows[tag] for tag in tags if tag in self.tag_rows]
+            if not matches:
+                return []
+            rows = np.unique(np.concatenate(matches))
+            rows = rows[(rows >= start) & (rows < stop)]
+            if len(rows) == 0:
+                return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        if rows is None:
+            scores = self.embeddings[start:stop] @ query
+            offset = start
+        elif len(rows) * GATHER_FRACTION < stop - start:
+            # A few rows: gathering them is cheaper than scanning the range
+            scores = self.embeddings[rows] @ query
+            offset = 0
+        else:
+            # Many rows: one sequential pass over the range, then pick theirs.
+            # Gathering would copy every row (random reads when memory-mapped)
+            scores = (self.embeddings[start:stop] @ query)[rows - start]
+            offset = 0
+
+        # argpartition finds the top k in linear time; only those k are sorted
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        results = []
+        for position in top:
+            similarity = float(scores[position])
+            if similarity <= threshold:
+                break
+            row = int(rows[position]) if rows is not None else int(position) + offset
+            results.append(dict(self.pages[row], similarity=similarity))
+
+        self.searches += 1
+        self.total_latency += time.perf_counter() - started
+        return results
+
+    def stats(self) -> Dict:
+        """Snapshot size and search latency"""
+        return {
+            'pages': len(self.pages),
+            'systems': len(self.system_ranges),
+            'tags': len(self.tag_rows),
+            'memory_mapped': isinstance(self.embeddings, np.memmap),
+            'matrix_mb': round(self.embeddings.nbytes / (1024 * 1024), 1),
+            'created_at': self.created_at,
+            'searches': self.searches,
+            'average_latency_ms': round(self.total_latency / self.searches * 1000, 2)
+                                  if self.searches else 0.0
+        }
+
+
+# Terms too common to help ranking; plainto_tsquery drops these as well
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just me more most
+my no nor not now of off on once only or other our out over own same she should so some such
+than that the their them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with you your
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Field weights mirror ts_rank's defaults for the search_vector weights:
+# tags (A) 1.0, summary (B) 0.4, content (D) 0.1. Term frequencies are
+# stored as integers scaled by TF_SCALE
+FIELD_WEIGHTS = (('tags', 10), ('summary', 4), ('content', 1))
+TF_SCALE = 10.0
+
+TEXT_INDEX_MAGIC = b'CTXI'
+TEXT_INDEX_FILE = 'text_index.bin'
+DELTA_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+
+def stem(word: str) -> str:
+    """Light suffix stripping so plural and -ing/-ed forms share a term"""
+    for suffix, replacement in (('ies', 'y'), ('ing', ''), ('ed', ''), ('s', '')):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == 's' and word.endswith(('ss', 'us', 'is')):
+                return word
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stemmed terms of ``text`` without stopwords"""
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower())
+            if token not in STOPWORDS]
+
+
+def weighted_terms(row: Dict) -> Dict[str, int]:
+    """Field-weighted term frequencies for one page"""
+    counts: Dict[str, int] = {}
+    for field, weight in FIELD_WEIGHTS:
+        value = row.get(field) or ''
+        if isinstance(value, list):
+            value = ' '.join(value)
+        for term in tokenize(value):
+            counts[term] = counts.get(term, 0) + weight
+    return counts
+
+
+class LocalTextIndex:
+    """BM25 full-text index over page tags, summaries and content
+
+    Postings are stored per term as delta-encoded document numbers in the
+    narrowest unsigned integer type that fits the largest gap, plus a
+    parallel array of scaled term frequencies. System and tag filters are
+    packed bitmaps. ``save`` writes everything to one file whose arrays
+    ``load`` memory-maps. Like plainto_tsquery, a page must contain every
+    query term to match.
+    """
+
+    def __init__(self, pages: List[Dict], terms: List[str], arrays: Dict[str, np.ndarray],
+                 systems: List[str], tags: List[str]):
+        self.pages = pages
+        self.terms = terms
+        self.term_numbers = {term: number for number, term in enumerate(terms)}
+        self.systems = systems
+        self.system_numbers = {system: number for number, system in enumerate(systems)}
+        self.tags = tags
+        self.tag_numbers = {tag: number for number, tag in enumerate(tags)}
+
+        self.term_starts = arrays['term_starts']      # int64 [terms + 1], posting index
+        self.term_offsets = arrays['term_offsets']    # int64 [terms], byte offset into deltas
+        self.term_widths = arrays['term_widths']      # uint8 [terms], bytes per delta
+        self.deltas = arrays['deltas']                # uint8 [bytes]
+        self.frequencies = arrays['frequencies']      # uint16 [postings]
+        self.doc_lengths = arrays['doc_lengths']      # float32 [pages]
+        self.system_bitmaps = arrays['system_bitmaps']  # uint8 [systems, pages / 8]
+        self.tag_bitmaps = arrays['tag_bitmaps']      # uint8 [tags, pages / 8]
+
+        self.average_length = float(self.doc_lengths.mean()) if len(pages) else 0.0
+        self.created_at: Optional[str] = None
+
+        # Stats
+        self.searches = 0
+        self.total_latency = 0.0
+
+    @classmethod
+    def build(cls, rows: Sequence[Dict]) -> 'LocalTextIndex':
+        """Index page rows that carry ``content``"""
+        return cls._empty().updated(rows, set())
+
+    @classmethod
+    def _empty(cls) -> 'LocalTextIndex':
+        return cls._from_postings([], [], np.zeros(0, np.int64), np.zeros(0, np.int64),
+                                  np.zeros(0, np.uint16), np.zeros(0, np.float32))
+
+    @classmethod
+    def _from_postings(cls, pages: List[Dict], terms: List[str], term_ids: np.ndarray,
+                       doc_ids: np.ndarray, frequencies: np.ndarray,
+                       doc_lengths: np.ndarray) -> 'LocalTextIndex':
+        """Encode (term, document, frequency) triples in any order"""
+        # Drop terms that no longer have postings and renumber the rest
+        used, term_ids = np.unique(term_ids, return_inverse=True)
+        terms = [terms[number] for number in used]
+
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids = term_ids[order]
+        doc_ids = doc_ids[order].astype(np.int64)
+        frequencies = frequencies[order].astype(np.uint16)
+        term_starts = np.searchsorted(term_ids, np.arange(len(terms) + 1)).astype(np.int64)
+
+        term_offsets = np.zeros(len(terms), dtype=np.int64)
+        term_widths = np.zeros(len(terms), dtype=np.uint8)
+        blocks = []
+        offset = 0
+        for number in range(len(terms)):
+            docs = doc_ids[term_starts[number]:term_starts[number + 1]]
+            gaps = np.diff(docs, prepend=0)
+            width = 1 if gaps.max() < 2 ** 8 else 2 if gaps.max() < 2 ** 16 else 4
+            block = gaps.astype(DELTA_DTYPES[width]).tobytes()
+            term_offsets[number] = offset
+            term_widths[number] = width
+            blocks.append(block)
+            offset += len(block)
+
+        systems = sorted({page['system'] for page in pages})
+        tags = sorted({tag for page in pages for tag in page['tags'] or []})
+        system_masks = np.zeros((len(systems), len(pages)), dtype=bool)
+        tag_masks = np.zeros((len(tags), len(pages)), dtype=bool)
+        system_numbers = {system: number for number, system in enumerate(systems)}
+        tag_numbers = {tag: number for number, tag in enumerate(tags)}
+        for row, page in enumerate(pages):
+            system_masks[system_numbers[page['system']], row] = True
+            for tag in page['tags'] or []:
+                tag_masks[tag_numbers[tag], row] = True
+
+        arrays = {
+            'term_starts': term_starts,
+            'term_offsets': term_offsets,
+            'term_widths': term_widths,
+            'deltas': np.frombuffer(b''.join(blocks), dtype=np.uint8),
+            'frequencies': frequencies,
+            'doc_lengths': doc_lengths.astype(np.float32),
+            'system_bitmaps': np.packbits(system_masks, axis=1),
+            'tag_bitmaps': np.packbits(tag_masks, axis=1)
+        }
+        return cls(pages, terms, arrays, systems, tags)
+
+    def postings(self, number: int) -> tuple:
+        """Document numbers and scaled frequencies for one term"""
+        start, stop = int(self.term_starts[number]), int(self.term_starts[number + 1])
+        width = int(self.term_widths[number])
+        offset = int(self.term_offsets[number])
+        gaps = self.deltas[offset:offset + (stop - start) * width].view(DELTA_DTYPES[width])
+        return np.cumsum(gaps, dtype=np.int64), self.frequencies[start:stop]
+
+    def updated(self, rows: Sequence[Dict], removed_ids: set) -> 'LocalTextIndex':
+        """A new index without ``removed_ids`` and with ``rows`` added
+
+        Postings of unchanged pages are carried over as they are; only the
+        new rows are tokenized. Pass the ids of changed pages in
+        ``removed_ids`` as well as in ``rows`` to replace them.
+        """
+        keep = np.array([page['id'] not in removed_ids for page in self.pages], dtype=bool)
+        renumber = np.cumsum(keep) - 1
+
+        term_ids = []
+        doc_ids = []
+        frequencies = []
+        for number in range(len(self.terms)):
+            docs, counts = self.postings(number)
+            kept = keep[docs]
+            term_ids.append(np.full(int(kept.sum()), number, dtype=np.int64))
+            doc_ids.append(renumber[docs[kept]])
+            frequencies.append(counts[kept])
+
+        pages = [page for page, kept in zip(self.pages, keep) if kept]
+        terms = list(self.terms)
+        term_numbers = dict(self.term_numbers)
+        lengths = [np.asarray(self.doc_lengths)[keep]]
+
+        new_terms, new_docs, new_counts, new_lengths = [], [], [], []
+        for row in rows:
+            document = len(pages)
+            counts = weighted_terms(row)
+            for term, count in counts.items():
+                if term not in term_numbers:
+                    term_numbers[term] = len(terms)
+                    terms.append(term)
+                new_terms.append(term_numbers[term])
+                new_docs.append(document)
+                new_counts.append(min(count, 65535))
+            new_lengths.append(sum(counts.values()) / TF_SCALE)
+            pages.append({
+                'id': row['id'],
+                'document_name': row['document_name'],
+                'page_number': row['page_number'],
+                'system': row['system'],
+                'tags': row['tags'] or [],
+                'summary': row['summary'],
+                'content_hash': row.get('content_hash')
+            })
+
+        term_ids.append(np.array(new_terms, dtype=np.int64))
+        doc_ids.append(np.array(new_docs, dtype=np.int64))
+        frequencies.append(np.array(new_counts, dtype=np.uint16))
+        lengths.append(np.array(new_lengths, dtype=np.float32))
+
+        return self._from_postings(pages, terms, np.concatenate(term_ids), np.concatenate(doc_ids),
+                                   np.concatenate(frequencies), np.concatenate(lengths))
+
+    def save(self, path: str):
+        """Write the index as a single file: header, JSON metadata, 64-byte aligned arrays"""
+        arrays = {
+            'term_starts': self.term_starts,
+            'term_offsets': self.term_offsets,
+            'term_widths': self.term_widths,
+            'deltas': self.deltas,
+            'frequencies': self.frequencies,
+            'doc_lengths': self.doc_lengths,
+            'system_bitmaps': self.system_bitmaps,
+            'tag_bitmaps': self.tag_bitmaps
+        }
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            offset = (offset + 63) // 64 * 64
+            layout[name] = [offset, array.dtype.str, list(array.shape)]
+            offset += array.nbytes
+
+        metadata = json.dumps({
+            'version': SNAPSHOT_VERSION,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'pages': self.pages,
+            'terms': self.terms,
+            'systems': self.systems,
+            'tags': self.tags,
+            'arrays': layout
+        }).encode('utf-8')
+        data_start = (16 + len(metadata) + 63) // 64 * 64
+
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as file:
+            file.write(TEXT_INDEX_MAGIC + struct.pack('<IQ', SNAPSHOT_VERSION, len(metadata)))
+            file.write(metadata)
+            for name, array in arrays.items():
+                file.seek(data_start + layout[name][0])
+                file.write(np.ascontiguousarray(array).tobytes())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'LocalTextIndex':
+        """Open an index file written by ``save``"""
+        with open(path, 'rb') as file:
+            magic, version, metadata_length = struct.unpack('<4sIQ', file.read(16))
+            if magic != TEXT_INDEX_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} text index")
+            metadata = json.loads(file.read(metadata_length))
+        data_start = (16 + metadata_length + 63) // 64 * 64
+
+        arrays = {}
+        for name, (offset, dtype, shape) in metadata['arrays'].items():
+            count = int(np.prod(shape))
+            if count == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r',
+                                         offset=data_start + offset, shape=tuple(shape))
+            else:
+                arrays[name] = np.fromfile(path, dtype=dtype, count=count,
+                                           offset=data_start + offset).reshape(shape)
+
+        index = cls(metadata['pages'], metadata['terms'], arrays,
+                    metadata['systems'], metadata['tags'])
+        index.created_at = metadata.get('created_at')
+        return index
+
+    def search(self, query: str, limit: int = 20, system: Optional[str] = None,
+               tags: Optional[Sequence[str]] = None, k1: float = 1.2,
+               b: float = 0.75, collapse: bool = False) -> List[Dict]:
+        """Top ``limit`` pages by BM25 that contain every query term
+
+        With ``collapse`` only the best page of each document is kept, with
+        the document's number of matching pages in ``document_hits``.
+        """
+        started = time.perf_counter()
+        page_count = len(self.pages)
+
+        numbers = []
+        for term in dict.fromkeys(tokenize(query)):
+            if term not in self.term_numbers:
+                return []
+            numbers.append(self.term_numbers[term])
+        if not numbers:
+            return []
+
+        scores = np.zeros(page_count, dtype=np.float32)
+        matched = np.zeros(page_count, dtype=np.uint8)
+        length_norm = k1 * (1 - b + b * np.asarray(self.doc_lengths) / max(self.average_length, 1e-9))
+        for number in numbers:
+            docs, counts = self.postings(number)
+            frequency = counts.astype(np.float32) / TF_SCALE
+            idf = np.log(1 + (page_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * frequency * (k1 + 1) / (frequency + length_norm[docs])
+            matched[docs] += 1
+
+        candidates = matched == len(numbers)
+        if system is not None:
+            if system not in self.system_numbers:
+                return []
+            candidates &= np.unpackbits(self.system_bitmaps[self.system_numbers[system]],
+                                        count=page_count).astype(bool)
+        if tags:
+            rows = [self.tag_numbers[tag] for tag in tags if tag in self.tag_numbers]
+            if not rows:
+                return []
+            tag_bits = np.bitwise_or.reduce(self.tag_bitmaps[rows], axis=0)
+            candidates &= np.unpackbits(tag_bits, count=page_count).astype(bool)
+
+        hits = np.flatnonzero(candidates)
+        if collapse:
+            hits = hits[np.argsort(-scores[hits], kind='stable')]
+            best = {}
+            for row in hits.tolist():
+                name = self.pages[row]['document_name']
+                if name in best:
+                    best[name][1] += 1
+                else:
+                    best[name] = [row, 1]
+            results = [dict(self.pages[row], rank=float(scores[row]), document_hits=count)
+                       for row, count in list(best.values())[:limit]]
+        else:
+            if limit < len(hits):
+                hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+            hits = hits[np.argsort(-scores[hits], kind='stable')]
+            results = [dict(self.pages[row], rank=float(scores[row])) for row in hits]
+
+        for result in results:
+            result.pop('content_hash', None)
+
+        self.searches += 1
+        self.total_latency += time.perf_counter() - started
+        return results
+
+    def stats(self) -> Dict:
+        """Index size and search latency"""
+        return {
+            'pages': len(self.pages),
+            'terms': len(self.terms),
+            'postings': len(self.frequencies),
+            'postings_mb': round((self.deltas.nbytes + self.frequencies.nbytes) / (1024 * 1024), 1),
+            'memory_mapped': isinstance(self.deltas, np.memmap),
+            'created_at': self.created_at,
+            'searches': self.searches,
+            'average_latency_ms': round(self.total_latency / self.searches * 1000, 2)
+                                  if self.searches else 0.0
+        }
+
+
+async def fetch_pages(db: AsyncPostgrest, columns: str, batch_size: int = 1000) -> List[Dict]:
+    """All pages, read in keyset-paginated batches"""
+    rows = []
+    last_id = None
+    while True:
+        filters = [('id', f"gt.{last_id}")] if last_id is not None else []
+        result = await db.select('construction_pages', columns=columns, filters=filters,
+                                 order='id.asc', limit=batch_size)
+        rows.extend(result.data)
+        print(f"   {len(rows):,} pages...", end='\r')
+        if len(result.data) < batch_size:
+            break
+        last_id = result.data[-1]['id']
+    print()
+    return rows
+
+
+async def fetch_pages_by_id(db: AsyncPostgrest, ids: Sequence[str], columns: str,
+                            batch_size: int = 200) -> List[Dict]:
+    """Pages with the given ids"""
+    rows = []
+    for start in range(0, len(ids), batch_size):
+        batch = ','.join(ids[start:start + batch_size])
+        result = await db.select('construction_pages', columns=columns,
+                                 filters=[('id', f"in.({batch})")])
+        rows.extend(result.data)
+    return rows
+
+
+def parse_embeddings(rows: List[Dict]) -> List[Dict]:
+    """PostgREST returns vector columns as '[0.1,0.2,...]' text"""
+    for row in rows:
+        if isinstance(row.get('embedding'), str):
+            row['embedding'] = json.loads(row['embedding'])
+    return rows
+
+
+# Everything the text index and the vector snapshot are built from
+EXPORT_COLUMNS = ','.join(SNAPSHOT_COLUMNS + ['content', 'content_hash', 'embedding'])
+
+
+def connect() -> AsyncPostgrest:
+    return AsyncPostgrest(os.getenv("SUPABASE_URL"),
+                          os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY"))
+
+
+async def export_snapshot(path: str, batch_size: int = 1000):
+    """Download construction_pages from Supabase and write a local snapshot"""
+    db = connect()
+    await db.start()
+    try:
+        print("📥 Downloading construction_pages...")
+        rows = parse_embeddings(await fetch_pages(db, EXPORT_COLUMNS, batch_size))
+    finally:
+        await db.close()
+
+    index = LocalVectorIndex.from_rows(rows)
+    index.save(path)
+    print(f"✅ Snapshot of {len(index.pages):,} pages ({index.embeddings.nbytes / (1024 * 1024):.1f} MB) written to {path}")
+
+    text_index = LocalTextIndex.build(rows)
+    text_index.save(os.path.join(path, TEXT_INDEX_FILE))
+    print(f"✅ Text index of {len(text_index.terms):,} terms, {len(text_index.frequencies):,} postings")
+
+
+async def update_snapshot(path: str, batch_size: int = 1000):
+    """Bring a snapshot up to date, downloading only new and changed pages"""
+    text_path = os.path.join(path, TEXT_INDEX_FILE)
+    if not os.path.exists(text_path):
+        await export_snapshot(path, batch_size)
+        return
+
+    text_index = LocalTextIndex.load(text_path, mmap=False)
+    vector_index = LocalVectorIndex.load(path, mmap=False)
+    known = {page['id']: page.get('content_hash') for page in text_index.pages}
+
+    db = connect()
+    await db.start()
+    try:
+        print("🔍 Comparing content hashes...")
+        current = {row['id']: row['content_hash']
+                   for row in await fetch_pages(db, 'id,content_hash', batch_size)}
+        changed = [page_id for page_id, digest in current.items()
+                   if page_id not in known or digest is None or known[page_id] != digest]
+        removed = set(known) - set(current)
+        rows = parse_embeddings(await fetch_pages_by_id(db, changed, EXPORT_COLUMNS))
+    finally:
+        await db.close()
+
+    if not changed and not removed:
+        print("✅ Snapshot is up to date")
+        return
+
+    replaced = removed | set(changed)
+    vector_index.updated(rows, replaced).save(path)
+    text_index.updated(rows, replaced).save(text_path)
+    print(f"✅ {len(changed):,} pages added or changed, {len(removed):,} removed")
+
+
+def benchmark(path: str, queries: int, limit: int, mmap: bool):
+    """Time random-vector searches against a snapshot"""
+    index = LocalVectorIndex.load(path, mmap=mmap)
+    if not index.pages:
+        print("❌ Snapshot is empty")
+        return
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((queries, index.embeddings.shape[1])).astype(np.float32)
+    systems = list(index.system_ranges)
+    cases = [("all systems", None, None), (f"system={systems[0]}", systems[0], None)]
+    if index.tag_rows:
+        # The most and least common tags take the scan and gather paths
+        by_size = sorted(index.tag_rows, key=lambda tag: len(index.tag_rows[tag]))
+        cases.extend((f"tags={tag}", None, [tag]) for tag in dict.fromkeys([by_size[-1], by_size[0]]))
+
+    for label, system, tags in cases:
+        index.search(vectors[0], limit, system=system, tags=tags)  # warm the page cache
+        timings = []
+        for vector in vectors:
+            started = time.perf_counter()
+            index.search(vector, limit, system=system, tags=tags)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f"{label:<24} p50 {timings[len(timings) // 2]:.2f} ms   "
+              f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms")
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Local search snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="Write a snapshot of construction_pages")
+    export.add_argument("--path", default=os.getenv("LOCAL_SEARCH_PATH", ".cache/local_search"))
+    export.add_argument("--batch-size", type=int, default=1000)
+
+    update = subparsers.add_parser("update", help="Download only new and changed pages into a snapshot")
+    update.add_argument("--path", default=os.getenv("LOCAL_SEARCH_PATH", ".cache/local_search"))
+    update.add_argument("--batch-size", type=int, default=1000)
+
+    bench = subparsers.add_parser("benchmark", help="Measure search latency on a snapshot")
+    bench.add_argument("--path", default=os.getenv("LOCAL_SEARCH_PATH", ".cache/local_search"))
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--limit", type=int, default=10)
+    bench.add_argument("--no-mmap", action="store_true", help="Load the matrix into memory")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        asyncio.run(export_snapshot(args.path, args.batch_size))
+    elif args.command == "update":
+        asyncio.run(update_snapshot(args.path, args.batch_size))
+    else:
+        benchmark(args.path, args.queries, args.limit, mmap=not args.no_mmap)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Response cache for the Construction Docs Search API
+Serialized JSON responses in an in-process LRU, optionally backed by a
+SQLite file shared between API worker processes
+"""
+
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """Two-tier cache of response bodies keyed by endpoint and parameters
+
+    Entries expire after ``ttl`` seconds. Keys include the corpus
+    version, so an ingest makes every older entry unreachable at once.
+    With ``shared_path`` a miss in memory falls through to a SQLite file
+    that other workers on the same host read and write too. SQLite calls
+    run on a single background thread, so a lock held by another worker
+    never blocks the event loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0,
+                 shared_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._shared: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._writes = 0
+
+        if shared_path:
+            os.makedirs(os.path.dirname(shared_path) or '.', exist_ok=True)
+            self._shared = sqlite3.connect(shared_path, timeout=1.0, check_same_thread=False)
+            self._shared.execute("PRAGMA journal_mode=WAL")
+            self._shared.execute("PRAGMA synchronous=NORMAL")
+            self._shared.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    etag TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._shared.commit()
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='response-cache')
+
+        # Stats
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def make_key(version: str, endpoint: str, params: Dict) -> str:
+        """Stable key for an endpoint call against one corpus version"""
+        canonical = json.dumps(params, sort_keys=True, separators=(',', ':'))
+        digest = hashlib.sha256(f"{endpoint}|{canonical}".encode('utf-8')).hexdigest()
+        return f"{version}:{digest}"
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        """Strong ETag from the body, so identical results revalidate across versions"""
+        return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    async def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """``(etag, body)`` for a live entry, else None"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            etag, body, expires_at = entry
+            if expires_at > now:
+                self.memory_hits += 1
+                self._entries.move_to_end(key)
+                return etag, body
+            del self._entries[key]
+
+        if self._shared is not None:
+            row = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._shared_get, key, now
+            )
+            if row is not None:
+                self.shared_hits += 1
+                self._remember(key, row[0], bytes(row[1]), row[2])
+                return row[0], bytes(row[1])
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, etag: str, body: bytes):
+        """Store a response body in both tiers"""
+        expires_at = time.time() + self.ttl
+        self._remember(key, etag, body, expires_at)
+
+        if self._shared is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._shared_set, key, etag, body, expires_at
+            )
+
+    def _shared_get(self, key: str, now: float):
+        try:
+            return self._shared.execute(
+                "SELECT etag, body, expires_at FROM response_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        except sqlite3.Error:
+            return None  # a busy shared tier is a miss, not an error
+
+    def _shared_set(self, key: str, etag: str, body: bytes, expires_at: float):
+        try:
+            self._shared.execute(
+                "INSERT OR REPLACE INTO response_cache (key, etag, body, expires_at) VALUES (?, ?, ?, ?)",
+                (key, etag, body, expires_at)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._shared.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+            self._shared.commit()
+        except sqlite3.Error:
+            pass
+
+    def _remember(self, key: str, etag: str, body: bytes, expires_at: float):
+        self._entries[key] = (etag, body, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Hit rates per tier"""
+        lookups = self.memory_hits + self.shared_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'shared': self._shared is not None,
+            'memory_hits': self.memory_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_rate': round((self.memory_hits + self.shared_hits) / lookups, 3) if lookups else 0.0
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+
+class CorpusVersion:
+    """Latest corpus version stamp, re-read at most every ``interval`` seconds
+
+    The document processor bumps the stamp after each ingest. Until the
+    first successful read, and whenever the database is unreachable, the
+    last known value is used.
+    """
+
+    def __init__(self, fetch, interval: float = 5.0):
+        self.fetch = fetch
+        self.interval = interval
+        self.value = '0'
+        self._checked_at = 0.0
+
+    async def current(self) -> str:
+        if time.monotonic() - self._checked_at >= self.interval:
+            self._checked_at = time.monotonic()
+            try:
+                self.value = str(await self.fetch())
+            except Exception as e:
+                print(f"⚠️ Could not read corpus version: {e}")
+        return self.value
@@ -7,8 +7,18 @@ Processes technical PDFs page-by-page with AI-generated summaries and metadata
 import os
 import sys
 import json
+import time
 import asyncio
-from typing import List, Dict, Optional
+import gc
+import glob
+import random
+import sqlite3
+import hashlib
+import argparse
+import functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
 import PyPDF2
 from pathlib import Path
@@ -17,34 +27,608 @@ from pathlib import Path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from supabase import create_client, Client
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 try:
     from sentence_transformers import SentenceTransformer
     HAS_SENTENCE_TRANSFORMERS = True
 except ImportError:
     HAS_SENTENCE_TRANSFORMERS = False
     print("⚠️ sentence-transformers not available, embeddings will be disabled")
-from openai import OpenAI  # Perplexity uses OpenAI-compatible API
+from openai import AsyncOpenAI, APIStatusError, APIConnectionError  # Perplexity uses OpenAI-compatible API
 from dotenv import load_dotenv
 import requests
 
 load_dotenv()
 
+EMBEDDING_DIMENSION = 384
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Bump when a prompt changes so cached LLM output from the old prompt is not reused
+PROMPT_VERSION = "1"
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of page text with whitespace normalized"""
+    normalized = ' '.join(text.split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    """SHA-256 of the file bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Number of pages in a PDF"""
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB, if it can be read"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Per-process reader for the extraction pool, opened once by the initializer
+_extraction_reader = None
+
+
+def _init_extraction_worker(pdf_path: str):
+    global _extraction_reader
+    _extraction_reader = PyPDF2.PdfReader(pdf_path)
+
+
+def _extract_page_text(page_index: int) -> str:
+    return _extraction_reader.pages[page_index].extract_text()
+
+
+class AnalysisCache:
+    """Persistent SQLite cache for LLM output and embeddings
+
+    Entries are keyed by a hash of the normalized page text, the kind of
+    result, the model name and ``PROMPT_VERSION``. When the stored values
+    exceed ``max_bytes`` the least recently used entries are evicted down
+    to ``EVICT_TO`` of the limit, so eviction does not run on every insert.
+    Access times of hits are written in batches, not one UPDATE per hit.
+    """
+    
+    TOUCH_BATCH = 100
+    EVICT_TO = 0.9
+    EVICT_BATCH = 500
+    
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL with NORMAL only syncs at checkpoints, not on every commit
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed)")
+        self.total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        self._touched: Dict[str, float] = {}
+        
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(kind: str, model: str, page_text: str) -> str:
+        return f"{kind}:{model}:{PROMPT_VERSION}:{content_hash(page_text)}"
+    
+    def get(self, key: str):
+        """Return the cached value or ``None``"""
+        row = self._db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        self._touched[key] = time.time()
+        if len(self._touched) >= self.TOUCH_BATCH:
+            self._flush_touched()
+        return json.loads(row[0])
+    
+    def _flush_touched(self):
+        """Write the buffered access times in one transaction"""
+        if not self._touched:
+            return
+        self._db.execute("BEGIN")
+        self._db.executemany("UPDATE cache SET accessed = ? WHERE key = ?",
+                             [(accessed, key) for key, accessed in self._touched.items()])
+        self._db.execute("COMMIT")
+        self._touched.clear()
+    
+    def set(self, key: str, value):
+        """Store a JSON-serializable value"""
+        payload = json.dumps(value)
+        size = len(payload)
+        
+        previous = self._db.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+        if previous:
+            self.total_bytes -= previous[0]
+        
+        self._db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+            (key, payload, size, time.time())
+        )
+        self.total_bytes += size
+        
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _evict(self):
+        """Drop least recently used entries until under the low-water mark"""
+        self._flush_touched()
+        target = self.max_bytes * self.EVICT_TO
+        while self.total_bytes > target:
+            # Oldest entries a batch at a time, off the accessed index
+            rows = self._db.execute("SELECT key, size FROM cache ORDER BY accessed LIMIT ?",
+                                    (self.EVICT_BATCH,)).fetchall()
+            if not rows:
+                break
+            
+            keys = []
+            for key, size in rows:
+                if self.total_bytes <= target:
+                    break
+                keys.append((key,))
+                self.total_bytes -= size
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM cache WHERE key = ?", keys)
+            self._db.execute("COMMIT")
+            self.evictions += len(keys)
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and size"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'size_bytes': self.total_bytes
+        }
+    
+    def close(self):
+        self._flush_touched()
+        self._db.close()
+
+
+class TokenBucket:
+    """Refilling budget of ``per_minute`` units, spent by LLM requests"""
+    
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+    
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available"""
+        self.refill()
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+    
+    def spend(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """Admit LLM requests within requests/min and tokens/min budgets
+
+    Callers ``await acquire(tokens)`` before each request. Waiters are
+    admitted one at a time in arrival order, so the number of coroutines
+    blocked in ``acquire`` is the scheduler's queue depth.
+    """
+    
+    def __init__(self, requests_per_minute: float = 50, tokens_per_minute: float = 40000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = asyncio.Lock()
+        
+        # Metrics
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.admitted = 0
+        self.retries = 0
+        self.total_wait = 0.0
+    
+    async def acquire(self, tokens: int):
+        """Wait until one request of ``tokens`` estimated tokens fits the budget"""
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        started = time.monotonic()
+        try:
+            async with self._lock:
+                while True:
+                    delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self.requests.spend(1)
+                self.tokens.spend(tokens)
+        finally:
+            self.queue_depth -= 1
+        
+        self.admitted += 1
+        self.total_wait += time.monotonic() - started
+    
+    def stats(self) -> Dict:
+        """Queue and throttling metrics"""
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'requests_admitted': self.admitted,
+            'retries': self.retries,
+            'average_wait_seconds': round(self.total_wait / self.admitted, 3)
+                                    if self.admitted else 0.0
+        }
+
+
+class EmbeddingService:
+    """Batch embedding requests and encode them on a dedicated worker thread
+
+    Callers submit one text at a time and get an ``asyncio.Future`` back.
+    Pending texts are flushed to the model as one ``encode`` call when
+    ``batch_size`` texts are waiting or ``max_wait_ms`` has passed since
+    the first of them arrived, whichever comes first.
+    """
+    
+    def __init__(self, model, batch_size: int = 32, max_wait_ms: float = 10,
+                 dimension: int = EMBEDDING_DIMENSION):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.dimension = dimension
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._pending: List = []
+        self._flush_handle = None
+        
+        # Stats
+        self.batches_encoded = 0
+        self.texts_encoded = 0
+        self.largest_batch = 0
+    
+    def submit(self, text: str) -> asyncio.Future:
+        """Queue a text for encoding and return a future for its vector"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        if self.model is None:
+            # Embeddings disabled, hand back a dummy vector
+            future.set_result([0.0] * self.dimension)
+            return future
+        
+        self._pending.append((text, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        
+        return future
+    
+    def submit_many(self, texts: List[str]) -> List[asyncio.Future]:
+        """Queue several texts and flush at once, so they share one ``encode`` call"""
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        
+        if self.model is None:
+            for future in futures:
+                future.set_result([0.0] * self.dimension)
+            return futures
+        
+        self._pending.extend(zip(texts, futures))
+        self._flush()
+        return futures
+    
+    async def embed(self, text: str) -> List[float]:
+        """Encode a single text"""
+        return await self.submit(text)
+    
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Encode several texts in one batch"""
+        return list(await asyncio.gather(*self.submit_many(texts)))
+    
+    def _flush(self):
+        """Send all pending texts to the worker thread as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, []
+        loop = asyncio.get_running_loop()
+        encoding = loop.run_in_executor(
+            self._executor, self._encode_batch, [text for text, _ in batch]
+        )
+        encoding.add_done_callback(functools.partial(self._resolve, batch))
+    
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Encode a batch on the worker thread"""
+        vectors = self.model.encode(texts, batch_size=len(texts)).tolist()
+        
+        self.batches_encoded += 1
+        self.texts_encoded += len(texts)
+        self.largest_batch = max(self.largest_batch, len(texts))
+        return vectors
+    
+    def _resolve(self, batch: List, encoding: asyncio.Future):
+        """Hand encoded vectors back to the waiting futures"""
+        error = None if encoding.cancelled() else encoding.exception()
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if encoding.cancelled():
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(encoding.result()[index])
+    
+    def stats(self) -> Dict:
+        """Batching statistics"""
+        return {
+            'batches_encoded': self.batches_encoded,
+            'texts_encoded': self.texts_encoded,
+            'average_batch_size': round(self.texts_encoded / self.batches_encoded, 2)
+                                  if self.batches_encoded else 0.0,
+            'largest_batch': self.largest_batch,
+            'pending': len(self._pending)
+        }
+    
+    def close(self):
+        """Stop the worker thread"""
+        self._executor.shutdown(wait=False)
+
+
+class PageWriter:
+    """Buffer construction_pages rows and write them as chunked upserts
+
+    Rows are upserted on the ``unique_page_per_doc (document_id,
+    page_number)`` constraint, so re-sending a chunk after a failure is
+    safe. A chunk is closed when it reaches ``chunk_size`` rows or
+    ``max_chunk_bytes`` of JSON payload, whichever comes first.
+    ``on_commit`` is called with the rows of every chunk once written.
+    """
+    
+    def __init__(self, supabase: Client, table: str = 'construction_pages',
+                 on_conflict: str = 'document_id,page_number',
+                 chunk_size: int = 100, max_chunk_bytes: int = 2_000_000,
+                 max_retries: int = 3, retry_delay: float = 1.0,
+                 on_commit: Optional[Callable[[List[Dict]], None]] = None):
+        self.supabase = supabase
+        self.table = table
+        self.on_conflict = on_conflict
+        self.chunk_size = max(1, chunk_size)
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.on_commit = on_commit
+        self._buffer: List[Dict] = []
+        self._buffer_bytes = 0
+        
+        # Stats
+        self.round_trips = 0
+        self.rows_written = 0
+        self.retries = 0
+    
+    async def add(self, row: Dict):
+        """Buffer a row, flushing once a full chunk is waiting"""
+        self._buffer.append(row)
+        self._buffer_bytes += self._row_size(row)
+        
+        if len(self._buffer) >= self.chunk_size or self._buffer_bytes >= self.max_chunk_bytes:
+            await self.flush()
+    
+    async def flush(self):
+        """Write every buffered row"""
+        rows, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        for chunk in self._chunks(rows):
+            await self._write_chunk(chunk)
+    
+    def _chunks(self, rows: List[Dict]):
+        """Split rows into chunks within the row and byte limits"""
+        chunk, chunk_bytes = [], 0
+        for row in rows:
+            row_bytes = self._row_size(row)
+            if chunk and (len(chunk) >= self.chunk_size
+                          or chunk_bytes + row_bytes > self.max_chunk_bytes):
+                yield chunk
+                chunk, chunk_bytes = [], 0
+            chunk.append(row)
+            chunk_bytes += row_bytes
+        if chunk:
+            yield chunk
+    
+    async def _write_chunk(self, chunk: List[Dict]):
+        """Upsert one chunk, retrying with exponential backoff"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await loop.run_in_executor(None, self._upsert, chunk)
+                self.round_trips += 1
+                self.rows_written += len(chunk)
+                if self.on_commit:
+                    self.on_commit(chunk)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"❌ Failed to write {len(chunk)} pages after {attempt + 1} attempts: {e}")
+                    raise
+                
+                delay = self.retry_delay * (2 ** attempt)
+                print(f"⚠️ Page write failed ({e}), retrying in {delay:.1f}s...")
+                self.retries += 1
+                await asyncio.sleep(delay)
+    
+    def _upsert(self, chunk: List[Dict]):
+        self.supabase.table(self.table).upsert(chunk, on_conflict=self.on_conflict).execute()
+    
+    @staticmethod
+    def _row_size(row: Dict) -> int:
+        return len(json.dumps(row, default=str))
+    
+    def stats(self) -> Dict:
+        """Write statistics"""
+        return {
+            'round_trips': self.round_trips,
+            'rows_written': self.rows_written,
+            'retries': self.retries
+        }
+
+
+class IngestJournal:
+    """Append-only JSON-lines record of ingest progress
+
+    Documents are keyed by file fingerprint. The journal records the
+    document row created for each file, every page whose row has been
+    written, and when the document is complete, so an interrupted batch
+    can resume where it stopped.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.documents: Dict[str, Dict] = {}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        
+        if os.path.exists(path):
+            with open(path, 'rb+') as file:
+                data = file.read()
+                for line in data.splitlines():
+                    try:
+                        self._apply(json.loads(line))
+                    except (json.JSONDecodeError, KeyError, UnicodeDecodeError):
+                        # A torn last line from a crash mid-write
+                        continue
+                
+                # Cut a torn tail, or the next entry would be appended onto it
+                end = data.rfind(b'\n') + 1
+                if end < len(data):
+                    file.truncate(end)
+        
+        self._file = open(path, 'a')
+    
+    def _apply(self, entry: Dict):
+        fingerprint = entry['fingerprint']
+        if entry['event'] == 'document':
+            self.documents[fingerprint] = {
+                'path': entry['path'],
+                'document_id': entry['document_id'],
+                'pages': set(),
+                'complete': False
+            }
+        elif entry['event'] == 'pages' and fingerprint in self.documents:
+            self.documents[fingerprint]['pages'].update(entry['pages'])
+        elif entry['event'] == 'complete' and fingerprint in self.documents:
+            self.documents[fingerprint]['complete'] = True
+    
+    def _append(self, entry: Dict):
+        self._apply(entry)
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def get(self, fingerprint: str) -> Optional[Dict]:
+        return self.documents.get(fingerprint)
+    
+    def start_document(self, fingerprint: str, path: str, document_id: str):
+        self._append({'event': 'document', 'fingerprint': fingerprint,
+                      'path': path, 'document_id': document_id})
+    
+    def pages_committed(self, fingerprint: str, page_numbers: List[int]):
+        self._append({'event': 'pages', 'fingerprint': fingerprint, 'pages': page_numbers})
+    
+    def complete_document(self, fingerprint: str):
+        self._append({'event': 'complete', 'fingerprint': fingerprint})
+    
+    def close(self):
+        self._file.close()
+
+
+def find_pdfs(source: str) -> List[str]:
+    """Expand a PDF path, directory or glob pattern into PDF paths"""
+    if os.path.isdir(source):
+        return sorted(str(path) for path in Path(source).rglob('*')
+                      if path.suffix.lower() == '.pdf' and path.is_file())
+    if glob.has_magic(source):
+        return sorted(path for path in glob.glob(source, recursive=True)
+                      if path.lower().endswith('.pdf'))
+    return [source]
+
+
 class ConstructionDocProcessor:
     """Process construction technical documents with page-level analysis"""
     
-    def __init__(self):
+    def __init__(self, analysis_mode: str = "combined", use_cache: bool = True):
+        # "combined" asks for summary, tags and system in one LLM call,
+        # "separate" keeps one call for the summary and one for the tags
+        if analysis_mode not in ("combined", "separate"):
+            raise ValueError(f"Unknown analysis mode: {analysis_mode}")
+        self.analysis_mode = analysis_mode
+        
         # Initialize Supabase
         self.supabase: Client = create_client(
             os.getenv("SUPABASE_URL"),
             os.getenv("SUPABASE_ANON_KEY")
         )
+        # Maintenance RPCs (stats refresh, version bump, index rebuilds) are not executable with the anon key
+        service_role_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        self.admin: Optional[Client] = create_client(
+            os.getenv("SUPABASE_URL"),
+            service_role_key
+        ) if service_role_key else None
         
         # Initialize Perplexity client (OpenAI-compatible)
         perplexity_key = os.getenv("PERPLEXITY_API_KEY")
+        self.llm_timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+        self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+        self.llm_scheduler = LLMScheduler(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "50")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "40000"))
+        )
         if perplexity_key:
-            self.ai_client = OpenAI(
+            # Retries are handled by _chat_completion so they go through the scheduler
+            self.ai_client = AsyncOpenAI(
                 api_key=perplexity_key,
-                base_url="https://api.perplexity.ai"
+                base_url=os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai"),
+                timeout=self.llm_timeout,
+                max_retries=0
             )
             self.ai_model = "sonar-small-chat"  # Fast Perplexity model for summaries
         else:
@@ -54,11 +638,23 @@ class ConstructionDocProcessor:
         # Initialize embedding model
         if HAS_SENTENCE_TRANSFORMERS:
             print("🤖 Loading embedding model...")
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
         else:
             print("⚠️ Embeddings disabled - install sentence-transformers for semantic search")
             self.embedding_model = None
         
+        # Batches page embeddings across the pages in flight
+        self.embedding_service = EmbeddingService(self.embedding_model)
+        
+        # Cache of LLM output and embeddings keyed by page content
+        if use_cache:
+            self.cache = AnalysisCache(
+                os.getenv("CONSTRUCTION_CACHE_PATH", ".cache/construction_analysis.sqlite"),
+                max_bytes=int(os.getenv("CONSTRUCTION_CACHE_MAX_MB", "512")) * 1024 * 1024
+            )
+        else:
+            self.cache = None
+        
         # System categories
         self.systems = ["HVAC", "Electrical", "Plumbing", "Fire-Safety", "Structural", "General"]
         
@@ -71,86 +667,606 @@ class ConstructionDocProcessor:
             "table", "checklist", "error-codes", "settings"
         ]
     
-    async def process_pdf(self, pdf_path: str, system_hint: Optional[str] = None) -> Dict:
-        """Process entire PDF document page by page"""
+    async def process_pdf(self, pdf_path: str, system_hint: Optional[str] = None,
+                          concurrency: int = 1, write_chunk_size: int = 100,
+                          write_chunk_bytes: int = 2_000_000,
+                          incremental: bool = False, extract_workers: int = 0,
+                          page_timeout: float = 60.0,
+                          journal: Optional[IngestJournal] = None,
+                          stream: bool = False,
+                          memory_soft_limit_mb: Optional[float] = None,
+                          refresh_stats: bool = True) -> Dict:
+        """Process entire PDF document page by page
+
+        ``concurrency`` sets how many pages are in flight at once. Text
+        extraction, LLM calls, embedding and the database write of
+        different pages overlap; ``concurrency=1`` keeps the original
+        one-page-at-a-time behaviour. Page rows are written in chunks of
+        up to ``write_chunk_size`` rows / ``write_chunk_bytes`` bytes.
+
+        With ``incremental`` an earlier upload of the same manual (same
+        file fingerprint, else same document name) is updated in place:
+        unchanged pages are skipped, changed pages re-processed and
+        upserted, and pages that no longer exist deleted.
+
+        ``extract_workers`` > 0 extracts page text in that many processes;
+        a page whose extraction takes longer than ``page_timeout`` seconds
+        is reported in ``failed_pages`` and left untouched.
+
+        With a ``journal``, pages already written by an interrupted run
+        are skipped and a fully ingested file is not processed again.
+
+        ``stream`` re-opens the PDF reader every 100 pages, dropping the
+        objects PyPDF2 caches, so memory stays flat on very large documents
+        at the cost of re-parsing the file's cross-reference table.
+        ``memory_soft_limit_mb`` throttles extraction once the process
+        grows past that resident size; it is not a hard cap. The peak RSS
+        is reported either way.
+
+        ``refresh_stats`` refreshes the per-system statistics behind
+        ``GET /systems`` and bumps the corpus version that the API's
+        response cache checks, once the document is written.
+        """
         print(f"📄 Processing: {pdf_path}")
+        start_time = time.perf_counter()
         
         # Extract basic info
         pdf_name = Path(pdf_path).name
+        fingerprint = file_fingerprint(pdf_path)
+        file_size = os.path.getsize(pdf_path)
         
-        # Create document record
-        doc_result = self.supabase.table('construction_documents').insert({
-            'document_name': pdf_name,
-            'document_type': 'manual',
-            'system_category': system_hint or 'General',
-            'uploaded_at': datetime.now().isoformat()
-        }).execute()
+        journal_entry = journal.get(fingerprint) if journal else None
+        if journal_entry and journal_entry['complete']:
+            print(f"⏭️  {pdf_name} was already ingested (journal), skipping")
+            return {
+                'document_id': journal_entry['document_id'],
+                'document_name': pdf_name,
+                'total_pages': None,
+                'processed_pages': 0,
+                'pages_skipped': len(journal_entry['pages']),
+                'pages_updated': 0,
+                'pages_added': 0,
+                'pages_removed': 0,
+                'failed_pages': [],
+                'system': system_hint or 'General',
+                'unchanged': True
+            }
+        
+        existing_doc = None
+        if incremental and not journal_entry:
+            existing_doc = await self.find_existing_document(pdf_name, fingerprint)
+        
+        if existing_doc and existing_doc.get('file_fingerprint') == fingerprint:
+            print(f"⏭️  {pdf_name} is unchanged since the last ingest, skipping")
+            return {
+                'document_id': existing_doc['id'],
+                'document_name': pdf_name,
+                'total_pages': existing_doc.get('total_pages'),
+                'processed_pages': 0,
+                'pages_skipped': existing_doc.get('total_pages') or 0,
+                'pages_updated': 0,
+                'pages_added': 0,
+                'pages_removed': 0,
+                'failed_pages': [],
+                'system': existing_doc.get('system_category') or system_hint or 'General',
+                'unchanged': True
+            }
         
-        document_id = doc_result.data[0]['id']
+        committed_pages = set()
+        if journal_entry:
+            # Resume an interrupted run on the same document row
+            document_id = journal_entry['document_id']
+            committed_pages = journal_entry['pages']
+            existing_hashes = {}
+            print(f"⏯️  Resuming {pdf_name} ({len(committed_pages)} pages already written)")
+        elif existing_doc:
+            document_id = existing_doc['id']
+            existing_hashes = await self.fetch_page_hashes(document_id)
+            print(f"🔁 Updating existing document ({len(existing_hashes)} stored pages)")
+        else:
+            # Create document record
+            doc_result = await self._run_blocking(
+                self.supabase.table('construction_documents').insert({
+                    'document_name': pdf_name,
+                    'document_type': 'manual',
+                    'system_category': system_hint or 'General',
+                    'uploaded_at': datetime.now().isoformat()
+                }).execute
+            )
+            document_id = doc_result.data[0]['id']
+            existing_hashes = {}
+        
+        if journal and not journal_entry:
+            journal.start_document(fingerprint, pdf_path, document_id)
+        
+        def record_commit(rows: List[Dict]):
+            journal.pages_committed(fingerprint, [row['page_number'] for row in rows])
+        
+        writer = PageWriter(self.supabase, chunk_size=write_chunk_size,
+                            max_chunk_bytes=write_chunk_bytes,
+                            on_commit=record_commit if journal else None)
+        
+        def unchanged(page_num: int, page_text: str) -> bool:
+            if page_num in committed_pages:
+                return True
+            return existing_hashes.get(page_num) == content_hash(page_text)
         
         # Process PDF
-        results = []
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            total_pages = len(pdf_reader.pages)
+        total_pages = await self._run_blocking(count_pdf_pages, pdf_path)
+        print(f"📚 Found {total_pages} pages to process...")
+        
+        pipeline = await self.run_page_pipeline(
+            pdf_path=pdf_path,
+            total_pages=total_pages,
+            document_id=document_id,
+            document_name=pdf_name,
+            system_hint=system_hint,
+            concurrency=concurrency,
+            writer=writer,
+            skip_page=unchanged if existing_hashes or committed_pages else None,
+            extract_workers=extract_workers,
+            page_timeout=page_timeout,
+            reopen_every=100 if stream else None,
+            memory_soft_limit_mb=memory_soft_limit_mb
+        )
+        
+        # Write whatever is left in the buffer
+        await writer.flush()
+        processed_pages = pipeline['processed_pages']
+        
+        # Drop pages that are gone (or empty) in this version
+        removed_pages = sorted(set(existing_hashes) - pipeline['seen_pages'])
+        if removed_pages:
+            await self.delete_pages(document_id, removed_pages)
+        
+        # Recording the fingerprint last marks the document as complete
+        await self._run_blocking(
+            self.supabase.table('construction_documents').update({
+                'file_fingerprint': fingerprint,
+                'file_size': file_size,
+                'total_pages': total_pages
+            }).eq('id', document_id).execute
+        )
+        if journal:
+            journal.complete_document(fingerprint)
+        if refresh_stats:
+            await self.refresh_stats()
+        
+        elapsed = time.perf_counter() - start_time
+        pages_per_second = len(processed_pages) / elapsed if elapsed > 0 else 0.0
+        pages_updated = sum(1 for page_num in processed_pages if page_num in existing_hashes)
+        peak_rss = peak_rss_mb()
+        
+        print(f"🎉 Completed! Processed {len(processed_pages)} pages "
+              f"in {elapsed:.1f}s ({pages_per_second:.2f} pages/s)")
+        if peak_rss is not None:
+            print(f"   Peak RSS: {peak_rss:.0f} MB")
+        if pipeline['failed_pages']:
+            print(f"⚠️ Could not extract pages: {pipeline['failed_pages']}")
+        if incremental:
+            print(f"   Skipped {pipeline['skipped']}, updated {pages_updated}, "
+                  f"added {len(processed_pages) - pages_updated}, removed {len(removed_pages)}")
+        return {
+            'document_id': document_id,
+            'document_name': pdf_name,
+            'total_pages': total_pages,
+            'processed_pages': len(processed_pages),
+            'pages_skipped': pipeline['skipped'],
+            'pages_updated': pages_updated,
+            'pages_added': len(processed_pages) - pages_updated,
+            'pages_removed': len(removed_pages),
+            'failed_pages': pipeline['failed_pages'],
+            'system': system_hint or 'General',
+            'concurrency': concurrency,
+            'elapsed_seconds': round(elapsed, 2),
+            'pages_per_second': round(pages_per_second, 3),
+            'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+            'db_round_trips': writer.round_trips,
+            'llm': self.llm_scheduler.stats(),
+            'cache': self.cache.stats() if self.cache else None
+        }
+    
+    async def ingest_batch(self, pdf_paths: List[str], system_hint: Optional[str] = None,
+                           max_documents: int = 2, **options) -> List[Dict]:
+        """Process several PDFs, at most ``max_documents`` at a time
+
+        ``options`` are passed to ``process_pdf``. A failing document is
+        recorded with its error and does not stop the batch.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_documents))
+        
+        async def ingest(pdf_path: str) -> Dict:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await self.process_pdf(pdf_path, system_hint,
+                                                    refresh_stats=False, **options)
+                    result['status'] = 'unchanged' if result.get('unchanged') else 'ok'
+                except Exception as e:
+                    print(f"❌ {pdf_path} failed: {e}")
+                    result = {
+                        'document_name': Path(pdf_path).name,
+                        'status': 'failed',
+                        'error': str(e),
+                        'processed_pages': 0,
+                        'failed_pages': []
+                    }
+                result['path'] = pdf_path
+                result['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+                return result
+        
+        results = list(await asyncio.gather(*[ingest(path) for path in pdf_paths]))
+        
+        # One statistics refresh and version bump for the whole batch
+        if any(result['status'] == 'ok' for result in results):
+            await self.refresh_stats()
+        return results
+    
+    async def refresh_stats(self):
+        """Refresh the materialized per-system statistics and bump the corpus version"""
+        if self.admin is None:
+            print("⚠️ SUPABASE_SERVICE_ROLE_KEY not set, system statistics and corpus version not updated")
+            return
+        try:
+            await self._run_blocking(self.admin.rpc('refresh_construction_stats', {}).execute)
+        except Exception as e:
+            # Stale stats should not fail an otherwise complete ingest
+            print(f"⚠️ Could not refresh system statistics: {e}")
+        try:
+            await self._run_blocking(self.admin.rpc('bump_construction_corpus_version', {}).execute)
+        except Exception as e:
+            # Cached API responses then expire by TTL instead
+            print(f"⚠️ Could not bump corpus version: {e}")
+    
+    async def rebuild_vector_index(self, index_type: str = 'hnsw'):
+        """Rebuild the embedding index, sizing IVFFlat lists from the row count"""
+        if self.admin is None:
+            raise RuntimeError("Rebuilding the vector index needs SUPABASE_SERVICE_ROLE_KEY "
+                               "(or use scripts/vector_index_tool.py with DATABASE_URL)")
+        print(f"🧭 Rebuilding {index_type} vector index...")
+        result = await self._run_blocking(
+            self.admin.rpc('rebuild_construction_vector_index', {'index_type': index_type}).execute
+        )
+        print(f"✅ {result.data}")
+    
+    async def find_existing_document(self, document_name: str, fingerprint: str) -> Optional[Dict]:
+        """Find an earlier upload by file fingerprint, then by name"""
+        columns = 'id, file_fingerprint, total_pages, system_category'
+        
+        result = await self._run_blocking(
+            self.supabase.table('construction_documents').select(columns)
+            .eq('file_fingerprint', fingerprint).limit(1).execute
+        )
+        if result.data:
+            return result.data[0]
+        
+        result = await self._run_blocking(
+            self.supabase.table('construction_documents').select(columns)
+            .eq('document_name', document_name)
+            .order('uploaded_at', desc=True).limit(1).execute
+        )
+        return result.data[0] if result.data else None
+    
+    async def fetch_page_hashes(self, document_id: str, batch_size: int = 1000) -> Dict[int, str]:
+        """Map page_number -> content_hash for the stored pages of a document"""
+        hashes = {}
+        offset = 0
+        while True:
+            result = await self._run_blocking(
+                self.supabase.table('construction_pages')
+                .select('page_number, content_hash')
+                .eq('document_id', document_id)
+                .order('page_number')
+                .range(offset, offset + batch_size - 1)
+                .execute
+            )
+            for row in result.data:
+                hashes[row['page_number']] = row['content_hash']
+            if len(result.data) < batch_size:
+                return hashes
+            offset += batch_size
+    
+    async def delete_pages(self, document_id: str, page_numbers: List[int], batch_size: int = 500):
+        """Delete stored pages of a document by page number"""
+        for i in range(0, len(page_numbers), batch_size):
+            await self._run_blocking(
+                self.supabase.table('construction_pages').delete()
+                .eq('document_id', document_id)
+                .in_('page_number', page_numbers[i:i + batch_size])
+                .execute
+            )
+    
+    async def run_page_pipeline(self, pdf_path: str, total_pages: int,
+                                document_id: str, document_name: str,
+                                system_hint: Optional[str] = None,
+                                concurrency: int = 1,
+                                writer: Optional[PageWriter] = None,
+                                skip_page: Optional[Callable[[int, str], bool]] = None,
+                                extract_workers: int = 0,
+                                page_timeout: float = 60.0,
+                                reopen_every: Optional[int] = None,
+                                memory_soft_limit_mb: Optional[float] = None) -> Dict:
+        """Extract pages and feed them to a fixed pool of page workers
+
+        A single producer extracts page text in order and hands it to
+        ``concurrency`` workers through a bounded queue, so at most
+        ``concurrency`` extracted pages wait for processing at any time.
+        Pages for which ``skip_page(page_number, text)`` is true are not
+        processed.
+
+        ``memory_soft_limit_mb`` is a soft throttle, not a hard cap: CPython
+        rarely hands memory back, so RSS stays above the limit once it gets
+        there. Each time RSS grows past its last high-water mark above the
+        limit, the writer is flushed once and the number of pages held at a
+        time is halved (down to one). The window widens again if RSS drops
+        back under the limit.
+
+        Page rows go to ``writer`` only; nothing per page is kept. Returns
+        the ``processed_pages`` numbers, the number ``skipped``, the set of
+        non-empty ``seen_pages`` and the ``failed_pages`` that could not be
+        extracted (counted as seen so they are never deleted).
+        """
+        concurrency = max(1, concurrency)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        processed_pages: List[int] = []
+        seen_pages = set()
+        failed_pages: List[int] = []
+        skipped = 0
+        in_flight = 0
+        window = concurrency
+        throttle_above = memory_soft_limit_mb
+        
+        async def throttle_memory():
+            nonlocal window, throttle_above
+            rss = current_rss_mb()
+            if rss is None:
+                return
             
-            print(f"📚 Found {total_pages} pages to process...")
+            if rss <= memory_soft_limit_mb:
+                window = min(concurrency, window * 2)
+                throttle_above = memory_soft_limit_mb
+            elif rss > throttle_above:
+                # New growth: release buffered rows once and hold fewer pages
+                window = max(1, window // 2)
+                if writer:
+                    await writer.flush()
+                gc.collect()
+                growth_step = max(16.0, memory_soft_limit_mb * 0.05)
+                throttle_above = max(memory_soft_limit_mb, current_rss_mb() or rss) + growth_step
+                print(f"⚠️ RSS {rss:.0f} MB above {memory_soft_limit_mb:.0f} MB, "
+                      f"holding at most {window} pages")
             
-            for page_num in range(total_pages):
-                print(f"📖 Processing page {page_num + 1}/{total_pages}...")
-                
-                # Extract page text
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
+            while window < concurrency and in_flight + queue.qsize() >= window:
+                await asyncio.sleep(0.05)
+        
+        async def produce():
+            nonlocal skipped
+            pages = self.iter_page_texts(pdf_path, total_pages, extract_workers, page_timeout,
+                                         reopen_every=reopen_every)
+            try:
+                async for page_num, page_text in pages:
+                    if memory_soft_limit_mb:
+                        await throttle_memory()
+                    
+                    if page_text is None:
+                        failed_pages.append(page_num)
+                        seen_pages.add(page_num)
+                        continue
+                    
+                    # Skip empty pages
+                    if not page_text.strip():
+                        continue
+                    
+                    seen_pages.add(page_num)
+                    if skip_page and skip_page(page_num, page_text):
+                        skipped += 1
+                        continue
+                    
+                    await queue.put((page_num, page_text))
+            finally:
+                await pages.aclose()
+            
+            for _ in range(concurrency):
+                await queue.put(None)
+        
+        async def work():
+            nonlocal in_flight
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
                 
-                # Skip empty pages
-                if not page_text.strip():
-                    continue
+                page_num, page_text = item
+                del item
+                print(f"📖 Processing page {page_num}/{total_pages}...")
                 
-                # Process page
-                page_data = await self.process_page(
-                    page_text=page_text,
-                    page_num=page_num + 1,
-                    document_id=document_id,
-                    document_name=pdf_name,
-                    system_hint=system_hint
-                )
+                in_flight += 1
+                try:
+                    await self.process_page(
+                        page_text=page_text,
+                        page_num=page_num,
+                        document_id=document_id,
+                        document_name=document_name,
+                        system_hint=system_hint,
+                        writer=writer
+                    )
+                finally:
+                    in_flight -= 1
                 
-                results.append(page_data)
+                # Drop the page text; the writer holds the row until it is flushed
+                page_text = None
+                processed_pages.append(page_num)
                 
                 # Progress update every 10 pages
-                if (page_num + 1) % 10 == 0:
-                    print(f"✅ Processed {page_num + 1}/{total_pages} pages")
+                if len(processed_pages) % 10 == 0:
+                    print(f"✅ Processed {len(processed_pages)}/{total_pages} pages")
         
-        print(f"🎉 Completed! Processed {len(results)} pages")
+        tasks = [asyncio.ensure_future(produce())]
+        tasks.extend(asyncio.ensure_future(work()) for _ in range(concurrency))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        processed_pages.sort()
         return {
-            'document_id': document_id,
-            'document_name': pdf_name,
-            'total_pages': total_pages,
-            'processed_pages': len(results),
-            'system': system_hint or 'General'
+            'processed_pages': processed_pages,
+            'skipped': skipped,
+            'seen_pages': seen_pages,
+            'failed_pages': sorted(failed_pages)
         }
     
-    async def process_page(self, page_text: str, page_num: int, 
-                          document_id: str, document_name: str,
-                          system_hint: Optional[str] = None) -> Dict:
-        """Process a single page"""
-        
-        # Identify system if not provided
-        system = system_hint or self.identify_system(page_text, document_name)
+    async def iter_page_texts(self, pdf_path: str, total_pages: int,
+                              extract_workers: int = 0, page_timeout: float = 60.0,
+                              reopen_every: Optional[int] = None):
+        """Yield ``(page_number, text)`` for every page, in page order
+
+        With ``extract_workers`` <= 0 pages are extracted one at a time on
+        a thread. Otherwise pages are spread over a process pool, keeping
+        a window of ``2 * extract_workers`` pages in progress. A page that
+        fails or exceeds ``page_timeout`` seconds is yielded with ``None``
+        text.
+
+        Inline extraction re-opens the reader every ``reopen_every`` pages
+        to drop the objects PyPDF2 caches as it walks the file.
+        """
+        if extract_workers <= 0:
+            file = None
+            try:
+                for page_index in range(total_pages):
+                    if file is None or (reopen_every and page_index % reopen_every == 0):
+                        if file:
+                            file.close()
+                        file = open(pdf_path, 'rb')
+                        pdf_reader = PyPDF2.PdfReader(file)
+                    
+                    page = pdf_reader.pages[page_index]
+                    yield page_index + 1, await self._run_blocking(page.extract_text)
+            finally:
+                if file:
+                    file.close()
+            return
         
-        # Generate summary
-        summary = await self.generate_summary(page_text)
+        loop = asyncio.get_running_loop()
+        executor = ProcessPoolExecutor(
+            max_workers=extract_workers,
+            initializer=_init_extraction_worker,
+            initargs=(pdf_path,)
+        )
+        in_flight = deque()
+        next_index = 0
+        stalled = False
+        try:
+            while next_index < total_pages or in_flight:
+                while next_index < total_pages and len(in_flight) < 2 * extract_workers:
+                    in_flight.append((next_index, loop.run_in_executor(
+                        executor, _extract_page_text, next_index
+                    )))
+                    next_index += 1
+                
+                page_index, extraction = in_flight.popleft()
+                try:
+                    page_text = await asyncio.wait_for(extraction, page_timeout)
+                except asyncio.TimeoutError:
+                    print(f"⚠️ Page {page_index + 1} extraction timed out after {page_timeout:.0f}s")
+                    stalled = True
+                    page_text = None
+                except Exception as e:
+                    print(f"⚠️ Page {page_index + 1} extraction failed: {e}")
+                    page_text = None
+                
+                yield page_index + 1, page_text
+        finally:
+            # shutdown() drops the executor's process table, so take it first
+            workers = list((getattr(executor, '_processes', None) or {}).values())
+            # Cancelling the asyncio wrapper cancels the queued pool future too
+            # (shutdown's cancel_futures needs Python 3.9)
+            for _, extraction in in_flight:
+                extraction.cancel()
+            executor.shutdown(wait=False)
+            if stalled:
+                # A worker stuck on a pathological page would block interpreter exit
+                for process in workers:
+                    process.terminate()
+    
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call on the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+    
+    async def _chat_completion(self, messages: List[Dict], max_tokens: int,
+                               temperature: float = 0.3) -> str:
+        """Send a chat completion through the rate-limit scheduler
+
+        429 and 5xx responses, timeouts and connection errors are retried
+        with exponential backoff (honouring ``Retry-After``); any other
+        error is raised straight away.
+        """
+        # Rough estimate: ~4 characters per prompt token plus the completion
+        estimated_tokens = sum(len(m['content']) for m in messages) // 4 + max_tokens
         
-        # Generate tags
-        tags = await self.generate_tags(page_text)
+        for attempt in range(self.llm_max_retries + 1):
+            await self.llm_scheduler.acquire(estimated_tokens)
+            try:
+                response = await self.ai_client.chat.completions.create(
+                    model=self.ai_model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=self.llm_timeout
+                )
+                return response.choices[0].message.content
+            except (APIStatusError, APIConnectionError) as e:
+                status = getattr(e, 'status_code', None)
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == self.llm_max_retries:
+                    raise
+                
+                delay = min(60.0, 2 ** attempt) + random.uniform(0, 0.5)
+                response = getattr(e, 'response', None)
+                retry_after = response.headers.get('retry-after') if response is not None else None
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+                
+                print(f"⚠️ LLM request failed ({status or type(e).__name__}), retrying in {delay:.1f}s...")
+                self.llm_scheduler.retries += 1
+                await asyncio.sleep(delay)
+    
+    async def process_page(self, page_text: str, page_num: int, 
+                          document_id: str, document_name: str,
+                          system_hint: Optional[str] = None,
+                          writer: Optional[PageWriter] = None) -> Dict:
+        """Process a single page
+
+        With a ``writer`` the row is buffered for a chunked upsert,
+        otherwise it is inserted straight away.
+        """
         
-        # Generate embedding
-        if self.embedding_model:
-            embedding = self.embedding_model.encode(page_text[:1000]).tolist()
+        if self.analysis_mode == "combined":
+            # Summary, tags and system classification in one call
+            analysis = await self.analyze_page(page_text)
+            summary = analysis['summary']
+            tags = analysis['tags']
+            # A system named in the filename still wins over the model's guess
+            system = (system_hint or self.system_from_filename(document_name)
+                      or analysis['system'] or self.identify_system(page_text, document_name))
         else:
-            # Create a dummy embedding for now
-            embedding = [0.0] * 384
+            # Identify system if not provided
+            system = system_hint or self.identify_system(page_text, document_name)
+            
+            # Generate summary and tags concurrently
+            summary, tags = await asyncio.gather(
+                self.generate_summary(page_text),
+                self.generate_tags(page_text)
+            )
+        
+        # Generate embedding (dummy vector when embeddings are disabled)
+        embedding = await self.embed_page(page_text)
         
         # Store in database
         page_data = {
@@ -161,10 +1277,16 @@ class ConstructionDocProcessor:
             'tags': tags,
             'summary': summary,
             'content': page_text,
+            'content_hash': content_hash(page_text),
             'embedding': embedding
         }
         
-        result = self.supabase.table('construction_pages').insert(page_data).execute()
+        if writer:
+            await writer.add(page_data)
+        else:
+            await self._run_blocking(
+                self.supabase.table('construction_pages').insert(page_data).execute
+            )
         
         return {
             'page_number': page_num,
@@ -173,15 +1295,22 @@ class ConstructionDocProcessor:
             'summary': summary[:100] + '...' if len(summary) > 100 else summary
         }
     
+    def system_from_filename(self, filename: str) -> Optional[str]:
+        """System named in the filename, if any"""
+        filename_lower = filename.lower()
+        for system in self.systems:
+            if system.lower() in filename_lower:
+                return system
+        return None
+    
     def identify_system(self, text: str, filename: str) -> str:
         """Identify system category from text content"""
         text_lower = text.lower()
-        filename_lower = filename.lower()
         
         # Check filename first
-        for system in self.systems:
-            if system.lower() in filename_lower:
-                return system
+        system = self.system_from_filename(filename)
+        if system:
+            return system
         
         # Check content
         system_keywords = {
@@ -198,19 +1327,136 @@ class ConstructionDocProcessor:
         
         return "General"
     
+    async def embed_page(self, page_text: str) -> List[float]:
+        """Embed the start of the page, reusing cached vectors"""
+        if not self.embedding_model or not self.cache:
+            return await self.embedding_service.embed(page_text[:1000])
+        
+        key = self.cache.make_key('embedding', EMBEDDING_MODEL_NAME, page_text[:1000])
+        embedding = self.cache.get(key)
+        if embedding is None:
+            embedding = await self.embedding_service.embed(page_text[:1000])
+            self.cache.set(key, embedding)
+        return embedding
+    
+    async def analyze_page(self, page_text: str) -> Dict:
+        """Generate summary, tags and system classification in one call
+
+        Returns a dict with ``summary``, ``tags`` and ``system`` (``None``
+        when the model could not classify the page). Falls back to the
+        preview summary and heuristic tags when the call fails.
+        """
+        if not self.ai_client:
+            return {
+                'summary': self.fallback_summary(page_text, 50),
+                'tags': self.extract_fallback_tags(page_text),
+                'system': None
+            }
+        
+        cache_key = self.cache.make_key('analysis', self.ai_model, page_text) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
+        try:
+            # Limit text to avoid token limits
+            text_sample = page_text[:2000]
+            
+            response_text = await self._chat_completion(
+                messages=[{
+                    "role": "system",
+                    "content": "You are a technical documentation expert. Respond with a single JSON object and nothing else."
+                }, {
+                    "role": "user",
+                    "content": f"""Analyze this technical documentation page.
+
+Return a JSON object with these keys:
+- "summary": 2-3 sentences covering the main topic, key specifications, important procedures or warnings
+- "tags": 4-5 tags chosen from: {', '.join(self.common_tags)}
+- "system": one of: {', '.join(self.systems)}
+
+Page text:
+{text_sample}
+
+JSON:"""
+                }],
+                max_tokens=200
+            )
+            
+            analysis = self.parse_analysis(response_text, page_text)
+            if cache_key:
+                self.cache.set(cache_key, analysis)
+            return analysis
+            
+        except Exception as e:
+            print(f"⚠️ Page analysis failed: {e}")
+            return {
+                'summary': self.fallback_summary(page_text, 30),
+                'tags': self.extract_fallback_tags(page_text),
+                'system': None
+            }
+    
+    def parse_analysis(self, response_text: str, page_text: str) -> Dict:
+        """Parse and validate a combined analysis response
+
+        Raises ``ValueError`` when the response holds no usable summary.
+        Tags outside ``self.common_tags`` and systems outside
+        ``self.systems`` are dropped.
+        """
+        start = response_text.find('{')
+        end = response_text.rfind('}')
+        if start == -1 or end < start:
+            raise ValueError("No JSON object in analysis response")
+        
+        analysis = json.loads(response_text[start:end + 1])
+        
+        summary = str(analysis.get('summary') or '').strip()
+        if not summary:
+            raise ValueError("Analysis response has no summary")
+        
+        raw_tags = analysis.get('tags') or []
+        if isinstance(raw_tags, str):
+            raw_tags = raw_tags.split(',')
+        
+        tags = []
+        for tag in raw_tags:
+            tag = str(tag).strip().lower().replace(' ', '-')
+            if tag in self.common_tags and tag not in tags:
+                tags.append(tag)
+        tags = tags[:5] or self.extract_fallback_tags(page_text)
+        
+        system = None
+        raw_system = str(analysis.get('system') or '').strip().lower()
+        for candidate in self.systems:
+            if candidate.lower() == raw_system:
+                system = candidate
+                break
+        
+        return {'summary': summary, 'tags': tags, 'system': system}
+    
+    def fallback_summary(self, page_text: str, word_count: int) -> str:
+        """Preview summary used when no AI summary is available"""
+        words = page_text.split()[:word_count]
+        return f"Page contains technical content. Preview: {' '.join(words)}..."
+    
     async def generate_summary(self, page_text: str) -> str:
         """Generate concise summary of page content"""
         if not self.ai_client:
             # Fallback summary without AI
-            words = page_text.split()[:50]
-            return f"Page contains technical content. Preview: {' '.join(words)}..."
+            return self.fallback_summary(page_text, 50)
+        
+        cache_key = self.cache.make_key('summary', self.ai_model, page_text) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
             
         try:
             # Limit text to avoid token limits
             text_sample = page_text[:2000]
             
-            response = self.ai_client.chat.completions.create(
-                model=self.ai_model,
+            response_text = await self._chat_completion(
                 messages=[{
                     "role": "system",
                     "content": "You are a technical documentation expert. Provide concise 2-3 sentence summaries."
@@ -224,30 +1470,36 @@ Page text:
 
 Summary:"""
                 }],
-                max_tokens=100,
-                temperature=0.3
+                max_tokens=100
             )
             
-            return response.choices[0].message.content.strip()
+            summary = response_text.strip()
+            if cache_key:
+                self.cache.set(cache_key, summary)
+            return summary
             
         except Exception as e:
             print(f"⚠️ Summary generation failed: {e}")
             # Fallback summary
-            words = page_text.split()[:30]
-            return f"Page contains technical content. Preview: {' '.join(words)}..."
+            return self.fallback_summary(page_text, 30)
     
     async def generate_tags(self, page_text: str) -> List[str]:
         """Generate 4-5 relevant tags for the page"""
         if not self.ai_client:
             # Use fallback tags
             return self.extract_fallback_tags(page_text)
+        
+        cache_key = self.cache.make_key('tags', self.ai_model, page_text) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
             
         try:
             # Limit text to avoid token limits
             text_sample = page_text[:1500]
             
-            response = self.ai_client.chat.completions.create(
-                model=self.ai_model,
+            response_text = await self._chat_completion(
                 messages=[{
                     "role": "system",
                     "content": "You are a technical documentation tagger. Provide exactly 4-5 single-word tags."
@@ -266,16 +1518,17 @@ Page text:
 
 Return exactly 4-5 single words separated by commas. Tags:"""
                 }],
-                max_tokens=30,
-                temperature=0.3
+                max_tokens=30
             )
             
-            tags_text = response.choices[0].message.content.strip()
+            tags_text = response_text.strip()
             tags = [tag.strip().lower() for tag in tags_text.split(',')][:5]
             
             # Validate tags are single words
             tags = [tag.split()[0] for tag in tags if tag]
             
+            if cache_key:
+                self.cache.set(cache_key, tags)
             return tags
             
         except Exception as e:
@@ -311,25 +1564,119 @@ Return exactly 4-5 single words separated by commas. Tags:"""
         return tags[:5]
 
 
+def print_batch_summary(results: List[Dict], elapsed: float):
+    """Print a per-document table of a batch ingest"""
+    print(f"\n{'Document':<40} {'Status':<10} {'Pages':>6} {'Skipped':>8} "
+          f"{'Failed':>7} {'Secs':>8} {'Pages/s':>8}")
+    print("-" * 92)
+    for result in results:
+        seconds = result.get('elapsed_seconds') or 0
+        pages = result.get('processed_pages', 0)
+        rate = pages / seconds if seconds else 0.0
+        print(f"{result['document_name'][:40]:<40} {result['status']:<10} {pages:>6} "
+              f"{result.get('pages_skipped', 0):>8} {len(result.get('failed_pages', [])):>7} "
+              f"{seconds:>8.1f} {rate:>8.2f}")
+    
+    total_pages = sum(result.get('processed_pages', 0) for result in results)
+    failed = [result for result in results if result['status'] == 'failed']
+    print("-" * 92)
+    print(f"📊 {len(results) - len(failed)}/{len(results)} documents ingested, "
+          f"{total_pages} pages in {elapsed:.1f}s ({total_pages / elapsed if elapsed else 0:.2f} pages/s)")
+    for result in failed:
+        print(f"❌ {result['path']}: {result['error']}")
+
+
 async def main():
-    """Test the processor with a sample document"""
-    processor = ConstructionDocProcessor()
+    """Ingest a PDF, a directory of PDFs or a glob pattern"""
+    parser = argparse.ArgumentParser(
+        description="Process construction PDFs page by page",
+        epilog="Example: python construction_doc_processor.py HVAC_Manual.pdf HVAC --concurrency 8\n"
+               "         python construction_doc_processor.py 'drops/2024-06/*.pdf' --max-documents 4",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("pdf_path", help="PDF file, directory or glob pattern to ingest")
+    parser.add_argument("system", nargs="?", default=None,
+                        help="System hint (HVAC, Electrical, Plumbing, ...)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of pages processed concurrently (default: 1)")
+    parser.add_argument("--max-documents", type=int, default=2,
+                        help="Documents processed concurrently in a batch (default: 2)")
+    parser.add_argument("--journal", default=None,
+                        help="Progress journal used to resume interrupted runs "
+                             "(batches default to .cache/ingest_journal.jsonl)")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="Do not record or resume batch progress")
+    parser.add_argument("--analysis-mode", choices=["combined", "separate"], default="combined",
+                        help="One LLM call per page for summary, tags and system, "
+                             "or separate summary and tag calls (default: combined)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update an earlier upload of this manual, re-processing only changed pages")
+    parser.add_argument("--extract-workers", type=int, default=0,
+                        help="Processes used for PDF text extraction (default: 0, inline)")
+    parser.add_argument("--page-timeout", type=float, default=60.0,
+                        help="Seconds allowed to extract one page with --extract-workers (default: 60)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Re-open the PDF reader every 100 pages to keep memory flat (for very large PDFs)")
+    parser.add_argument("--memory-soft-limit-mb", "--max-memory-mb", dest="memory_soft_limit_mb",
+                        type=float, default=None,
+                        help="Soft limit: throttle extraction as resident memory grows past this many MB")
+    parser.add_argument("--rebuild-index", choices=["hnsw", "ivfflat"], default=None,
+                        help="Rebuild the vector index after ingest (IVFFlat lists sized from row count; "
+                             "needs SUPABASE_SERVICE_ROLE_KEY)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Skip the local summary/tag/embedding cache")
+    parser.add_argument("--write-chunk-size", type=int, default=100,
+                        help="Maximum pages per database upsert (default: 100)")
+    parser.add_argument("--write-chunk-bytes", type=int, default=2_000_000,
+                        help="Maximum JSON payload per database upsert (default: 2000000)")
+    args = parser.parse_args()
     
-    # Check for command line arguments
-    if len(sys.argv) < 2:
-        print("Usage: python construction_doc_processor.py <pdf_path> [system]")
-        print("Example: python construction_doc_processor.py HVAC_Manual.pdf HVAC")
+    pdf_paths = find_pdfs(args.pdf_path)
+    if not pdf_paths:
+        print(f"❌ No PDFs found for {args.pdf_path}")
         sys.exit(1)
     
-    pdf_path = sys.argv[1]
-    system = sys.argv[2] if len(sys.argv) > 2 else None
+    processor = ConstructionDocProcessor(analysis_mode=args.analysis_mode,
+                                         use_cache=not args.no_cache)
+    journal_path = args.journal
+    if journal_path is None and len(pdf_paths) > 1:
+        journal_path = ".cache/ingest_journal.jsonl"
+    journal = IngestJournal(journal_path) if journal_path and not args.no_journal else None
+    options = dict(
+        concurrency=args.concurrency,
+        write_chunk_size=args.write_chunk_size,
+        write_chunk_bytes=args.write_chunk_bytes,
+        incremental=args.incremental,
+        extract_workers=args.extract_workers,
+        page_timeout=args.page_timeout,
+        journal=journal,
+        stream=args.stream,
+        memory_soft_limit_mb=args.memory_soft_limit_mb
+    )
     
-    # Process the document
-    result = await processor.process_pdf(pdf_path, system)
-    
-    print("\n📊 Processing Complete!")
-    print(json.dumps(result, indent=2))
+    try:
+        if len(pdf_paths) == 1:
+            # Process the document
+            result = await processor.process_pdf(pdf_paths[0], args.system, **options)
+            
+            print("\n📊 Processing Complete!")
+            print(json.dumps(result, indent=2))
+        else:
+            print(f"📦 Batch ingest of {len(pdf_paths)} documents")
+            started = time.perf_counter()
+            results = await processor.ingest_batch(pdf_paths, args.system,
+                                                   max_documents=args.max_documents, **options)
+            print_batch_summary(results, time.perf_counter() - started)
+        
+        if args.rebuild_index:
+            await processor.rebuild_vector_index(args.rebuild_index)
+    finally:
+        if journal:
+            journal.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted - run the same command again to resume from the journal")
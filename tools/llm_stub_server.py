@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub server
+Answers /chat/completions with canned responses so the document processor's
+LLM client, rate limiting and retries can be exercised without Perplexity
+"""
+
+import json
+import time
+import random
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class StubCompletionHandler(BaseHTTPRequestHandler):
+    """Handle OpenAI-style chat completion requests"""
+
+    latency = 0.0
+    error_rate = 0.0
+    requests_served = 0
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        content_length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(content_length) or b'{}')
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        # Inject rate limiting and server errors to exercise retries
+        if random.random() < self.error_rate:
+            status = random.choice([429, 500, 503])
+            self.send_json(status, {"error": {"message": "Injected failure"}},
+                           headers={'Retry-After': '1'} if status == 429 else None)
+            return
+
+        StubCompletionHandler.requests_served += 1
+        prompt = request.get('messages', [{}])[-1].get('content', '')
+        content = self.completion_for(prompt)
+
+        self.send_json(200, {
+            "id": f"stub-{StubCompletionHandler.requests_served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get('model', 'stub'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4
+            }
+        })
+
+    def completion_for(self, prompt: str) -> str:
+        """Pick a canned answer that matches the prompt type"""
+        if prompt.rstrip().endswith('JSON:'):
+            return json.dumps({
+                "summary": "Stub summary of the page. It covers installation and maintenance.",
+                "tags": ["installation", "maintenance", "reference", "safety"],
+                "system": "HVAC"
+            })
+        if prompt.rstrip().endswith('Tags:'):
+            return "installation, maintenance, reference, safety"
+        return "Stub summary of the page. It covers installation and maintenance."
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Seconds to wait before answering (default: 0.2)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429/5xx (default: 0)")
+    args = parser.parse_args()
+
+    StubCompletionHandler.latency = args.latency
+    StubCompletionHandler.error_rate = args.error_rate
+
+    server = ThreadingHTTPServer(('localhost', args.port), StubCompletionHandler)
+    print(f"🧪 Stub LLM server on http://localhost:{args.port}")
+    print(f"   PERPLEXITY_BASE_URL=http://localhost:{args.port} PERPLEXITY_API_KEY=stub")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 Served {StubCompletionHandler.requests_served} completions")
+
+
+if __name__ == "__main__":
+    main()